@@ -0,0 +1,22 @@
+from django.core.cache import cache
+
+from apps.product.cache import get_catalog_content_version
+
+from .store import get_cart_store
+
+CART_CACHE_TIMEOUT = 60 * 60
+
+
+def get_cart_totals(user_id):
+  # La clave usa la version del carrito (Cart.version, o la del estado en el
+  # cache con CART_STORE = cache), que sube con cada cambio hecho desde
+  # cualquier proceso, y la del contenido del catalogo porque los precios
+  # pueden cambiar sin tocar el carrito
+  store = get_cart_store()
+  key = 'cart:user:%s:totals:%s:%s' % (
+    user_id, store.status(user_id)['version'], get_catalog_content_version())
+  totals = cache.get(key)
+  if totals is None:
+    totals = store.totals(user_id)
+    cache.set(key, totals, CART_CACHE_TIMEOUT)
+  return totals
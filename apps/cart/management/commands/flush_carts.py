@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.cart.models import Cart
+from apps.cart.store import CacheCartStore
+
+
+class Command(BaseCommand):
+  help = 'Guarda en la base los carritos modificados en el cache (CART_STORE = cache)'
+
+  def handle(self, *args, **options):
+    store = CacheCartStore()
+    user_ids = store.dirty_user_ids()
+
+    for user_id in user_ids:
+      try:
+        store.flush(user_id)
+      except Cart.DoesNotExist:
+        # usuario borrado
+        store.forget(user_id)
+
+    self.stdout.write(self.style.SUCCESS(
+      '%s carritos guardados' % len(user_ids)))
@@ -0,0 +1,85 @@
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.cart.models import Cart, CartItem
+from apps.cart.store import get_cart_store
+
+
+class Command(BaseCommand):
+  help = (
+    'Borra por lotes los items de carrito sin cambios por mas de '
+    'CART_ITEM_MAX_AGE_DAYS dias y descuenta total_items de sus carritos'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--days', type=int, default=settings.CART_ITEM_MAX_AGE_DAYS)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    # Pausa entre lotes para no cargar la base en horas de uso
+    parser.add_argument('--pause', type=float, default=0.1)
+    parser.add_argument('--dry-run', action='store_true')
+
+  def handle(self, *args, **options):
+    cutoff = timezone.now() - timedelta(days=options['days'])
+    store = get_cart_store()
+    # Con CART_STORE = cache, los carritos con cambios sin guardar no se
+    # tocan: su contenido real esta en el cache, no en CartItem
+    stale = CartItem.objects.filter(updated_at__lt=cutoff, cart__dirty=False)
+
+    if options['dry_run']:
+      self.stdout.write('%s items de %s carritos por borrar' % (
+        stale.count(), stale.values('cart_id').distinct().count()))
+      return
+
+    deleted = 0
+    carts = set()
+    last_id = 0
+    while True:
+      # Lotes cortos, cada uno en su transaccion. skip_locked salta los items
+      # que un usuario esta cambiando en ese momento en vez de esperarlos;
+      # los bloqueados aqui no pueden cambiar hasta borrarlos
+      with transaction.atomic():
+        rows = list(
+          stale.filter(id__gt=last_id).select_for_update(
+            skip_locked=True, of=('self',)
+          ).order_by('id').values_list('id', 'cart_id', 'cart__user_id')[
+            :options['batch_size']])
+        if not rows:
+          break
+        last_id = rows[-1][0]
+
+        CartItem.objects.filter(id__in=[item_id for item_id, _, _ in rows]).delete()
+
+        # Un update por cada cantidad distinta de items borrados. La version
+        # del carrito cambia el ETag y la clave de los totales cacheados en
+        # todos los workers
+        removed = Counter(cart_id for _, cart_id, _ in rows)
+        by_count = defaultdict(list)
+        for cart_id, count in removed.items():
+          by_count[count].append(cart_id)
+        for count, cart_ids in by_count.items():
+          Cart.objects.filter(id__in=cart_ids).update(
+            total_items=F('total_items') - count, version=F('version') + 1)
+
+        user_ids = {user_id for _, _, user_id in rows}
+        transaction.on_commit(lambda user_ids=user_ids: self.forget(store, user_ids))
+
+      deleted += len(rows)
+      carts.update(removed)
+      time.sleep(options['pause'])
+
+    self.stdout.write(self.style.SUCCESS(
+      '%s items borrados de %s carritos' % (deleted, len(carts))))
+
+  def forget(self, store, user_ids):
+    # Descarta las copias en el cache (CART_STORE = cache) para que se
+    # recarguen sin los items borrados, salvo las que cambiaron mientras tanto
+    for user_id in Cart.objects.filter(
+        user_id__in=user_ids, dirty=False).values_list('user_id', flat=True):
+      store.forget(user_id)
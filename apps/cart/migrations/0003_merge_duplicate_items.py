@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-16 20:07
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # Antes de la restriccion: un solo item por (carrito, producto), con la
+    # suma de las cantidades, y total_items recalculado desde los items
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+
+    duplicates = CartItem.objects.values('cart_id', 'product_id').annotate(
+        rows=Count('id'), first_id=Min('id'), total=Sum('count')
+    ).filter(rows__gt=1)
+
+    for duplicate in duplicates:
+        CartItem.objects.filter(id=duplicate['first_id']).update(
+            count=duplicate['total'])
+        CartItem.objects.filter(
+            cart_id=duplicate['cart_id'], product_id=duplicate['product_id']
+        ).exclude(id=duplicate['first_id']).delete()
+
+    for cart in Cart.objects.annotate(items=Count('cartitem')):
+        if cart.total_items != cart.items:
+            Cart.objects.filter(id=cart.id).update(total_items=cart.items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+    ]
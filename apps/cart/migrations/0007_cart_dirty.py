@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0006_cartitem_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='dirty',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
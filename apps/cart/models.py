@@ -8,9 +8,25 @@ User = settings.AUTH_USER_MODEL
 class Cart(models.Model):
   user = models.OneToOneField(User, on_delete=models.CASCADE)
   total_items = models.IntegerField(default=0)
+  # Sube con cada cambio; los clientes la comparan para saber si su copia
+  # del carrito esta al dia (respuestas delta)
+  version = models.PositiveIntegerField(default=0)
+  # CART_STORE = cache: el carrito tiene cambios en el cache aun no guardados
+  # en CartItem (los busca flush_carts)
+  dirty = models.BooleanField(default=False, db_index=True)
 
 
 class CartItem(models.Model):
   cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
   product = models.ForeignKey(Product, on_delete=models.CASCADE)
   count = models.IntegerField()
+  # Ultimo cambio del item; con el se borran los abandonados (prune_carts).
+  # bulk_update y update() no lo tocan solos: hay que pasarlo a mano
+  updated_at = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    # Un producto aparece una sola vez por carrito (lo usan los contadores)
+    unique_together = ('cart', 'product')
+    indexes = [
+      models.Index(fields=['updated_at'], name='cart_item_updated_idx'),
+    ]
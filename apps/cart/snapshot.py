@@ -0,0 +1,47 @@
+from apps.product.models import Product
+from apps.product.serializers import ProductSerializer
+
+from .models import CartItem
+
+
+def get_cart_snapshot(cart):
+  # Items del carrito con su producto en una sola consulta y serializados de
+  # una vez, en el mismo orden que antes (por producto)
+  cart_items = list(
+    CartItem.objects.filter(cart=cart).select_related('product').order_by('product'))
+  products = ProductSerializer(
+    [cart_item.product for cart_item in cart_items], many=True).data
+  return [
+    {'id': cart_item.id, 'count': cart_item.count, 'product': product}
+    for cart_item, product in zip(cart_items, products)
+  ]
+
+
+def serialize_cart_items(items):
+  # Lo mismo a partir de items {'id', 'product_id', 'count'} que no vienen
+  # de CartItem (carrito en cache); id es None si aun no se guardo
+  products = Product.objects.in_bulk([item['product_id'] for item in items])
+  items = [item for item in items if item['product_id'] in products]
+  serialized = ProductSerializer(
+    [products[item['product_id']] for item in items], many=True).data
+  return [
+    {'id': item['id'], 'count': item['count'], 'product': product}
+    for item, product in zip(items, serialized)
+  ]
+
+
+def serialize_cart_item(item, product):
+  # Un solo item (respuestas delta), con la misma forma que en el carrito
+  return {
+    'id': item['id'], 'count': item['count'],
+    'product': ProductSerializer(product).data,
+  }
+
+
+def wants_delta(request):
+  # ?delta=1 (o "delta" en el cuerpo): las modificaciones devuelven solo el
+  # item cambiado, total_items y la version, en vez del carrito completo
+  delta = request.query_params.get('delta')
+  if delta is None and hasattr(request.data, 'get'):
+    delta = request.data.get('delta')
+  return str(delta).lower() in ('1', 'true')
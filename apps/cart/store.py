@@ -0,0 +1,383 @@
+import logging
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+from apps.product.models import Product
+
+from .models import Cart, CartItem
+from .snapshot import get_cart_snapshot, serialize_cart_items
+
+CART_TOTAL_FIELD = DecimalField(max_digits=12, decimal_places=2)
+CART_LOCK_TIMEOUT = 5
+CART_LOCK_WAIT = 0.01
+CART_LOCK_RETRIES = 50
+# Los carritos sin cambios pendientes pueden expirar (se recargan de la base);
+# los que tienen cambios se guardan sin expiracion
+CART_STATE_TIMEOUT = 60 * 60 * 24
+
+logger = logging.getLogger(__name__)
+
+
+class ItemExists(Exception):
+  pass
+
+
+class ItemMissing(Exception):
+  pass
+
+
+class CartBusy(Exception):
+  pass
+
+
+def quantize(value):
+  return (value or Decimal('0')).quantize(Decimal('0.01'))
+
+
+def merge_counts(current, counts, products):
+  # Carrito de invitado sobre el actual: suma si alcanza el stock, y agrega
+  # los nuevos que alcancen. Devuelve (actualizados, nuevos) como
+  # {product_id: count}
+  updated = {}
+  created = {}
+  for product_id, count in counts.items():
+    quantity = int(products[product_id].quantity)
+    if product_id in current:
+      if count + int(current[product_id]) <= quantity:
+        updated[product_id] = count + int(current[product_id])
+    elif count <= quantity:
+      created[product_id] = count
+  return updated, created
+
+
+class DatabaseCartStore:
+  # El carrito vive en Cart/CartItem (comportamiento por defecto)
+
+  def items(self, user_id):
+    return list(
+      CartItem.objects.filter(cart__user_id=user_id).order_by(
+        'product').values('id', 'product_id', 'count'))
+
+  def has(self, user_id, product_id):
+    return CartItem.objects.filter(
+      cart__user_id=user_id, product_id=product_id).exists()
+
+  def snapshot(self, user_id):
+    return get_cart_snapshot(Cart.objects.get(user_id=user_id))
+
+  def total_items(self, user_id):
+    return Cart.objects.get(user_id=user_id).total_items
+
+  def status(self, user_id):
+    version, total_items = Cart.objects.filter(
+      user_id=user_id).values_list('version', 'total_items').get()
+    return {'version': version, 'total_items': total_items}
+
+  def totals(self, user_id):
+    totals = CartItem.objects.filter(cart__user_id=user_id).aggregate(
+      total_cost=Sum(F('product__price') * F('count'), output_field=CART_TOTAL_FIELD),
+      total_compare_cost=Sum(
+        F('product__compare_price') * F('count'), output_field=CART_TOTAL_FIELD),
+    )
+    return {name: quantize(value) for name, value in totals.items()}
+
+  def add(self, user_id, product_id, count):
+    cart = Cart.objects.get(user_id=user_id)
+    # La restriccion unica (cart, product) resuelve las peticiones
+    # simultaneas: solo una crea el item y suma al contador
+    try:
+      with transaction.atomic():
+        item = CartItem.objects.create(product_id=product_id, cart=cart, count=count)
+    except IntegrityError:
+      raise ItemExists()
+    Cart.objects.filter(id=cart.id).update(
+      total_items=F('total_items') + 1, version=F('version') + 1)
+    return {'id': item.id, 'product_id': product_id, 'count': count}
+
+  def update(self, user_id, product_id, count):
+    item = CartItem.objects.filter(
+      cart__user_id=user_id, product_id=product_id).first()
+    if item is None:
+      raise ItemMissing()
+    item.count = count
+    item.save(update_fields=['count', 'updated_at'])
+    Cart.objects.filter(user_id=user_id).update(version=F('version') + 1)
+    return {'id': item.id, 'product_id': product_id, 'count': count}
+
+  def remove(self, user_id, product_id):
+    deleted, _ = CartItem.objects.filter(
+      cart__user_id=user_id, product_id=product_id).delete()
+    if not deleted:
+      raise ItemMissing()
+    Cart.objects.filter(user_id=user_id).update(
+      total_items=F('total_items') - 1, version=F('version') + 1)
+
+  def clear(self, user_id):
+    deleted, _ = CartItem.objects.filter(cart__user_id=user_id).delete()
+    if deleted:
+      Cart.objects.filter(user_id=user_id).update(
+        total_items=0, version=F('version') + 1)
+    return bool(deleted)
+
+  def merge(self, user_id, counts, products):
+    cart = Cart.objects.get(user_id=user_id)
+    with transaction.atomic():
+      existing = {
+        item.product_id: item
+        for item in CartItem.objects.select_for_update().filter(
+          cart=cart, product_id__in=list(counts))
+      }
+      updated, created = merge_counts(
+        {product_id: item.count for product_id, item in existing.items()},
+        counts, products)
+
+      now = timezone.now()
+      for product_id, count in updated.items():
+        existing[product_id].count = count
+        existing[product_id].updated_at = now
+      CartItem.objects.bulk_update(
+        [existing[product_id] for product_id in updated], ['count', 'updated_at'])
+      CartItem.objects.bulk_create([
+        CartItem(product_id=product_id, cart=cart, count=count)
+        for product_id, count in created.items()
+      ])
+      if updated or created:
+        Cart.objects.filter(id=cart.id).update(
+          total_items=F('total_items') + len(created), version=F('version') + 1)
+    return bool(updated or created)
+
+  def flush(self, user_id):
+    pass
+
+  def forget(self, user_id):
+    pass
+
+  def dirty_user_ids(self):
+    return []
+
+
+@contextmanager
+def cart_lock(user_id):
+  key = 'cart:user:%s:lock' % user_id
+  for _ in range(CART_LOCK_RETRIES):
+    if cache.add(key, 1, CART_LOCK_TIMEOUT):
+      break
+    time.sleep(CART_LOCK_WAIT)
+  else:
+    raise CartBusy()
+  try:
+    yield
+  finally:
+    cache.delete(key)
+
+
+class CacheCartStore:
+  # El carrito vive en el cache y se guarda en CartItem despues (comando
+  # flush_carts) o al pagar. Necesita un cache compartido entre workers que
+  # no expulse claves sin expiracion (Redis con maxmemory-policy volatile-*).
+  # Estado: {'items': {product_id: {'id', 'count'}}, 'version', 'dirty'}.
+  # version arranca del reloj al cargar, para no repetir versiones que un
+  # cliente ya vio si el estado fue expulsado del cache.
+  # Los carritos con cambios pendientes se marcan en Cart.dirty (una vez,
+  # al pasar de guardado a pendiente), sin lock ni clave global.
+
+  def state_key(self, user_id):
+    return 'cart:user:%s:items' % user_id
+
+  def store_state(self, user_id, state):
+    timeout = None if state['dirty'] else CART_STATE_TIMEOUT
+    cache.set(self.state_key(user_id), state, timeout)
+
+  def load(self, user_id):
+    state = cache.get(self.state_key(user_id))
+    if state is None:
+      if Cart.objects.filter(user_id=user_id, dirty=True).update(dirty=False):
+        # El cache lo expulso con cambios sin guardar: se pierden
+        logger.warning(
+          'Carrito del usuario %s expulsado del cache con cambios sin guardar',
+          user_id)
+      state = {
+        'items': {
+          product_id: {'id': item_id, 'count': count}
+          for item_id, product_id, count in CartItem.objects.filter(
+            cart__user_id=user_id).values_list('id', 'product_id', 'count')
+        },
+        'version': time.time_ns(),
+        'dirty': False,
+      }
+      cache.add(self.state_key(user_id), state, CART_STATE_TIMEOUT)
+    return state
+
+  def save(self, user_id, state):
+    was_dirty = state['dirty']
+    state['version'] += 1
+    state['dirty'] = True
+    self.store_state(user_id, state)
+    if not was_dirty:
+      self.mark_dirty(user_id)
+
+  def mark_dirty(self, user_id):
+    Cart.objects.filter(user_id=user_id).update(dirty=True)
+
+  def dirty_user_ids(self):
+    return list(Cart.objects.filter(dirty=True).values_list('user_id', flat=True))
+
+  def items(self, user_id):
+    items = self.load(user_id)['items']
+    return [
+      {'id': items[product_id]['id'], 'product_id': product_id,
+       'count': items[product_id]['count']}
+      for product_id in sorted(items)
+    ]
+
+  def has(self, user_id, product_id):
+    return product_id in self.load(user_id)['items']
+
+  def snapshot(self, user_id):
+    return serialize_cart_items(self.items(user_id))
+
+  def total_items(self, user_id):
+    return len(self.load(user_id)['items'])
+
+  def status(self, user_id):
+    state = self.load(user_id)
+    return {'version': state['version'], 'total_items': len(state['items'])}
+
+  def totals(self, user_id):
+    items = self.load(user_id)['items']
+    total_cost = Decimal('0')
+    total_compare_cost = Decimal('0')
+    for product_id, price, compare_price in Product.objects.filter(
+        id__in=list(items)).values_list('id', 'price', 'compare_price'):
+      total_cost += price * items[product_id]['count']
+      total_compare_cost += compare_price * items[product_id]['count']
+    return {
+      'total_cost': quantize(total_cost),
+      'total_compare_cost': quantize(total_compare_cost),
+    }
+
+  def add(self, user_id, product_id, count):
+    with cart_lock(user_id):
+      state = self.load(user_id)
+      if product_id in state['items']:
+        raise ItemExists()
+      state['items'][product_id] = {'id': None, 'count': count}
+      self.save(user_id, state)
+    return {'id': None, 'product_id': product_id, 'count': count}
+
+  def update(self, user_id, product_id, count):
+    with cart_lock(user_id):
+      state = self.load(user_id)
+      if product_id not in state['items']:
+        raise ItemMissing()
+      state['items'][product_id]['count'] = count
+      self.save(user_id, state)
+    return {
+      'id': state['items'][product_id]['id'], 'product_id': product_id, 'count': count}
+
+  def remove(self, user_id, product_id):
+    with cart_lock(user_id):
+      state = self.load(user_id)
+      if state['items'].pop(product_id, None) is None:
+        raise ItemMissing()
+      self.save(user_id, state)
+
+  def clear(self, user_id):
+    with cart_lock(user_id):
+      state = self.load(user_id)
+      if not state['items']:
+        return False
+      state['items'] = {}
+      self.save(user_id, state)
+      return True
+
+  def merge(self, user_id, counts, products):
+    with cart_lock(user_id):
+      state = self.load(user_id)
+      updated, created = merge_counts(
+        {product_id: item['count'] for product_id, item in state['items'].items()},
+        counts, products)
+      for product_id, count in updated.items():
+        state['items'][product_id]['count'] = count
+      for product_id, count in created.items():
+        state['items'][product_id] = {'id': None, 'count': count}
+      if updated or created:
+        self.save(user_id, state)
+    return bool(updated or created)
+
+  def flush(self, user_id):
+    # Escribe el carrito del cache en CartItem (al pagar y en flush_carts)
+    state = cache.get(self.state_key(user_id))
+    if state is None or not state['dirty']:
+      return
+
+    items = state['items']
+    # Productos borrados mientras estaban en el carrito
+    product_ids = set(
+      Product.objects.filter(id__in=list(items)).values_list('id', flat=True))
+    items = {
+      product_id: item for product_id, item in items.items()
+      if product_id in product_ids
+    }
+
+    with transaction.atomic():
+      cart = Cart.objects.select_for_update().get(user_id=user_id)
+      existing = {item.product_id: item for item in CartItem.objects.filter(cart=cart)}
+
+      CartItem.objects.filter(cart=cart).exclude(product_id__in=list(items)).delete()
+      changed = []
+      now = timezone.now()
+      for product_id, item in existing.items():
+        if product_id in items and item.count != items[product_id]['count']:
+          item.count = items[product_id]['count']
+          item.updated_at = now
+          changed.append(item)
+      CartItem.objects.bulk_update(changed, ['count', 'updated_at'])
+      CartItem.objects.bulk_create([
+        CartItem(product_id=product_id, cart=cart, count=item['count'])
+        for product_id, item in items.items() if product_id not in existing
+      ])
+      Cart.objects.filter(id=cart.id).update(total_items=len(items), dirty=False)
+      ids = dict(
+        CartItem.objects.filter(cart=cart).values_list('product_id', 'id'))
+
+    version = state['version']
+
+    def mark_saved():
+      # Si el carrito cambio mientras se guardaba, queda pendiente
+      with cart_lock(user_id):
+        current = cache.get(self.state_key(user_id))
+        if current is None:
+          return
+        for product_id, item in current['items'].items():
+          item['id'] = ids.get(product_id, item['id'])
+        if current['version'] == version:
+          current['dirty'] = False
+        self.store_state(user_id, current)
+      if current['dirty']:
+        self.mark_dirty(user_id)
+
+    transaction.on_commit(mark_saved)
+
+  def forget(self, user_id):
+    # Tras modificar CartItem directamente (checkout): se recarga de la base.
+    # Al confirmar: si el checkout se revierte, el estado del cache (con
+    # cambios aun sin guardar) sigue valiendo
+    def discard():
+      cache.delete(self.state_key(user_id))
+      Cart.objects.filter(user_id=user_id).update(dirty=False)
+
+    transaction.on_commit(discard, robust=True)
+
+
+def get_cart_store():
+  if settings.CART_STORE == 'cache':
+    return CacheCartStore()
+  return DatabaseCartStore()
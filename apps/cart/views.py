@@ -1,9 +1,13 @@
+from django.utils.cache import get_conditional_response
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Cart, CartItem
+from core.cache import make_etag, patch_private_etag
+from apps.product.cache import get_catalog_version
+from .cache import get_cart_totals
 from apps.product.models import Product
-from apps.product.serializers import ProductSerializer
+from .snapshot import serialize_cart_item, wants_delta
+from .store import ItemExists, ItemMissing, get_cart_store
 
 # Create your views here.
 
@@ -11,20 +15,23 @@ class GetItemsView(APIView):
   def get(self, request, format=None):
     user = self.request.user
     try:
-      cart = Cart.objects.get(user=user)
-      cart_items = CartItem.objects.order_by('product').filter(cart=cart)
-      result = []
-      if CartItem.objects.filter(cart=cart).exists():
-        for cart_item in cart_items:
-          item = {}
-          item['id'] = cart_item.id
-          item['count'] = cart_item.count
-          product = Product.objects.get(id=cart_item.product.id)
-          product = ProductSerializer(product)
-          item['product'] = product.data
-          result.append(item)
-      return Response({'cart': result}, 
-                      status=status.HTTP_200_OK)
+      store = get_cart_store()
+      # La version del carrito (Cart.version, o la del estado en el cache con
+      # CART_STORE = cache) se lee antes que los items: si cambian entre
+      # medio, el cliente vera una version vieja y volvera a pedir el carrito
+      version = store.status(user.id)['version']
+      # Los items llevan los datos de cada producto: el ETag depende tambien
+      # del catalogo
+      etag = make_etag('cart', user.id, version, get_catalog_version())
+      not_modified = get_conditional_response(request, etag=etag)
+      if not_modified is not None:
+        return patch_private_etag(not_modified, etag)
+
+      result = store.snapshot(user.id)
+      return patch_private_etag(
+        Response({'cart': result, 'version': version}, 
+                 status=status.HTTP_200_OK),
+        etag)
     except:
       return Response(
         {'error': 
@@ -45,35 +52,29 @@ class AddItemView(APIView):
     count = 1
 
     try:
-      if not Product.objects.filter(id=product_id).exists():
+      product = Product.objects.filter(id=product_id).first()
+      if product is None:
         return Response(
           {'error': 'Este producto no existe'},
           status=status.HTTP_404_NOT_FOUND) 
-      product = Product.objects.get(id=product_id)  
-      cart = Cart.objects.get(user=user)
-      if CartItem.objects.filter(cart=cart, product=product).exists():
+      store = get_cart_store()
+      if int(product.quantity) > 0:
+        try:
+          item = store.add(user.id, product.id, count)
+        except ItemExists:
+          return Response(
+            {'error': 'El artículo ya está en el carrito'},
+            status=status.HTTP_409_CONFLICT)
+        if wants_delta(request):
+          return Response(
+            dict(store.status(user.id), item=serialize_cart_item(item, product)),
+            status=status.HTTP_201_CREATED)
+        result = store.snapshot(user.id)
+        return Response({'cart': result}, status=status.HTTP_201_CREATED)
+      elif store.has(user.id, product.id):
         return Response(
           {'error': 'El artículo ya está en el carrito'},
           status=status.HTTP_409_CONFLICT)
-      if int(product.quantity) > 0:
-        CartItem.objects.create(
-          product=product, cart=cart, count=count)
-      if CartItem.objects.filter(cart=cart, product=product).exists():
-        total_items = int(cart.total_items) + 1
-        Cart.objects.filter(user=user).update(
-          total_items=total_items)
-        cart_items = CartItem.objects.order_by(
-          'product').filter(cart=cart)
-        result = []
-        for cart_item in cart_items:
-          item = {}
-          item['id'] = cart_item.id
-          item['count'] = cart_item.count
-          product = Product.objects.get(id=cart_item.product.id)
-          product = ProductSerializer(product)
-          item['product'] = product.data
-          result.append(item)
-        return Response({'cart': result}, status=status.HTTP_201_CREATED)
       else:
         return Response(
           {'error': 'Not enough of this item in stock'},
@@ -87,20 +88,12 @@ class GetTotalView(APIView):
   def get(self, request, format=None):
     user = self.request.user
     try:
-      cart = Cart.objects.get(user=user)
-      cart_items = CartItem.objects.filter(cart=cart)
-      total_cost = 0.0
-      total_compare_cost = 0.0
-      if cart_items.exists():
-        for cart_item in cart_items:
-          total_cost += (float(cart_item.product.price) 
-                         * float(cart_item.count))
-          total_compare_cost += (float(cart_item.product.compare_price) 
-                                 * float(cart_item.count))
-        total_cost = round(total_cost, 2)
-        total_compare_cost = round(total_compare_cost, 2)
+      # Suma en la base, en Decimal, cacheada hasta el proximo cambio del
+      # carrito o del catalogo
+      totals = get_cart_totals(user.id)
       return Response(
-        {'total_cost': total_cost, 'total_compare_cost': total_compare_cost},
+        {'total_cost': totals['total_cost'],
+         'total_compare_cost': totals['total_compare_cost']},
       status=status.HTTP_200_OK)
     except:
       return Response(
@@ -111,11 +104,18 @@ class GetItemTotalView(APIView):
   def get(self, request, format=None):
     user = self.request.user
     try:
-      cart = Cart.objects.get(user=user)
-      total_items = cart.total_items
-      return Response(
-        {'total_items': total_items},
-      status=status.HTTP_200_OK)
+      # Version y total en una sola lectura
+      cart = get_cart_store().status(user.id)
+      etag = make_etag('cart-total-items', user.id, cart['version'])
+      not_modified = get_conditional_response(request, etag=etag)
+      if not_modified is not None:
+        return patch_private_etag(not_modified, etag)
+
+      return patch_private_etag(
+        Response(
+          {'total_items': cart['total_items']},
+        status=status.HTTP_200_OK),
+        etag)
     except:
       return Response(
         {'error': 'Algo salió mal al obtener un número total de artículos'},
@@ -138,32 +138,29 @@ class UpdateItemView(APIView):
         {'error': 'El valor de conteo debe ser un entero'},
       status=status.HTTP_404_NOT_FOUND)
     try:
-      if not Product.objects.filter(id=product_id).exists():
+      product = Product.objects.filter(id=product_id).first()
+      if product is None:
         return Response(
           {'error': 'Este producto no existe'},
         status=status.HTTP_404_NOT_FOUND)  
-      product = Product.objects.get(id=product_id)
-      cart = Cart.objects.get(user=user)
-      if not CartItem.objects.filter(cart=cart, product=product).exists():
+      store = get_cart_store()
+      if not store.has(user.id, product.id):
         return Response(
           {'error': 'Este producto no está en su carrito'},
         status=status.HTTP_404_NOT_FOUND)
       quantity = product.quantity
       if count <= quantity:
-        CartItem.objects.filter(
-          product=product, cart=cart
-        ).update(count=count)
-        cart_items = CartItem.objects.order_by(
-          'product').filter(cart=cart)
-        result = []
-        for cart_item in cart_items:
-          item = {}
-          item['id'] = cart_item.id
-          item['count'] = cart_item.count
-          product = Product.objects.get(id=cart_item.product.id)
-          product = ProductSerializer(product)
-          item['product'] = product.data
-          result.append(item)
+        try:
+          item = store.update(user.id, product.id, count)
+        except ItemMissing:
+          return Response(
+            {'error': 'Este producto no está en su carrito'},
+          status=status.HTTP_404_NOT_FOUND)
+        if wants_delta(request):
+          return Response(
+            dict(store.status(user.id), item=serialize_cart_item(item, product)),
+            status=status.HTTP_200_OK)
+        result = store.snapshot(user.id)
         return Response({'cart': result}, status=status.HTTP_200_OK)
       else:
         return Response(
@@ -185,32 +182,22 @@ class RemoveItemView(APIView):
         {'error': 'La ID del producto debe ser un entero'},
         status=status.HTTP_404_NOT_FOUND)
     try:
-      if not Product.objects.filter(id=product_id).exists():
-        return Response(
-          {'error': 'Este producto no existe'},
-        status=status.HTTP_404_NOT_FOUND)  
-      product = Product.objects.get(id=product_id)
-      cart = Cart.objects.get(user=user)
-      if not CartItem.objects.filter(cart=cart, product=product).exists():
+      store = get_cart_store()
+      try:
+        store.remove(user.id, product_id)
+      except ItemMissing:
+        if not Product.objects.filter(id=product_id).exists():
+          return Response(
+            {'error': 'Este producto no existe'},
+          status=status.HTTP_404_NOT_FOUND)  
         return Response(
           {'error': 'Este producto no está en su carrito'},
         status=status.HTTP_404_NOT_FOUND)  
-      CartItem.objects.filter(cart=cart, product=product).delete()
-      if not CartItem.objects.filter(cart=cart, product=product).exists():
-      # actualizar numero total en el carrito
-        total_items = int(cart.total_items) - 1
-        Cart.objects.filter(user=user).update(total_items=total_items)
-      cart_items = CartItem.objects.order_by('product').filter(cart=cart)
-      result = []
-      if CartItem.objects.filter(cart=cart).exists():
-        for cart_item in cart_items:
-          item = {}
-          item['id'] = cart_item.id
-          item['count'] = cart_item.count
-          product = Product.objects.get(id=cart_item.product.id)
-          product = ProductSerializer(product)
-          item['product'] = product.data
-          result.append(item)
+      if wants_delta(request):
+        return Response(
+          dict(store.status(user.id), removed=product_id),
+          status=status.HTTP_200_OK)
+      result = store.snapshot(user.id)
       return Response({'cart': result}, status=status.HTTP_200_OK)
     except:
       return Response(
@@ -221,14 +208,10 @@ class EmptyCartView(APIView):
   def delete(self, request, format=None):
     user = self.request.user
     try:
-      cart = Cart.objects.get(user=user)
-      if not CartItem.objects.filter(cart=cart).exists():
+      if not get_cart_store().clear(user.id):
         return Response(
           {'success': 'El carrito ya está vacío'},
         status=status.HTTP_200_OK)
-      CartItem.objects.filter(cart=cart).delete()
-      # Actualizamos carrito
-      Cart.objects.filter(user=user).update(total_items=0)
       return Response(
         {'success': 'Carro vaciado con éxito'},
       status=status.HTTP_200_OK)
@@ -243,55 +226,34 @@ class SynchCartView(APIView):
     data = self.request.data
     try:
       cart_items = data['cart_items']
+      # Validar todo el carrito de invitado antes de escribir; si un
+      # producto se repite se suman las cantidades
+      counts = {}
       for cart_item in cart_items:
-        cart = Cart.objects.get(user=user)
         try:
           product_id = int(cart_item['product_id'])
         except:
           return Response(
             {'error': 'Product ID must be an integer'},
           status=status.HTTP_404_NOT_FOUND)
-        if not Product.objects.filter(id=product_id).exists():
-          return Response(
-            {'error': 'Product with this ID does not exist'},
-          status=status.HTTP_404_NOT_FOUND)
-        product = Product.objects.get(id=product_id)
-        quantity = product.quantity
-        if CartItem.objects.filter(cart=cart, product=product).exists():
-          # Actualiizamos el item del carrito
-          item = CartItem.objects.get(cart=cart, product=product)
-          count = item.count
-          try:
-            cart_item_count = int(cart_item['count'])
-          except:
-            cart_item_count = 1
-          #Chequeo con base de datos
-          if (cart_item_count + int(count)) <= int(quantity):
-            updated_count = cart_item_count + int(count)
-            CartItem.objects.filter(
-              cart=cart, product=product
-            ).update(count=updated_count)
-        else:
-          #Agregar el item al carrito del usuario
-          try:
-            cart_item_count = int(cart_item['count'])
-          except:
-            cart_item_count = 1
-          if cart_item_count <= quantity:
-            CartItem.objects.create(
-              product=product, cart=cart, count=cart_item_count
-            )
-            if CartItem.objects.filter(cart=cart, product=product).exists():
-              #Sumar item
-              total_items = int(cart.total_items) + 1
-              Cart.objects.filter(user=user).update(
-                total_items=total_items
-              )
+        try:
+          cart_item_count = int(cart_item['count'])
+        except:
+          cart_item_count = 1
+        counts[product_id] = counts.get(product_id, 0) + cart_item_count
+
+      products = Product.objects.in_bulk(list(counts))
+      if len(products) != len(counts):
         return Response(
-          {'success': 'Cart Synchronized'},
-        status=status.HTTP_201_CREATED) 
+          {'error': 'Product with this ID does not exist'},
+        status=status.HTTP_404_NOT_FOUND)
+
+      get_cart_store().merge(user.id, counts, products)
+
+      return Response(
+        {'success': 'Cart Synchronized'},
+      status=status.HTTP_201_CREATED) 
     except:
       return Response(
         {'error': 'Something went wrong when synching cart'},
       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-      
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-16 19:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_category_closure(apps, schema_editor):
+    Category = apps.get_model('category', 'Category')
+    CategoryClosure = apps.get_model('category', 'CategoryClosure')
+
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    links = []
+
+    for category_id in parents:
+        ancestor_id = category_id
+        depth = 0
+        seen = set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            links.append(CategoryClosure(
+                ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+            ancestor_id = parents.get(ancestor_id)
+            depth += 1
+
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='category.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='category.category')),
+            ],
+            options={
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_category_closure, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
 # Create your models here.
@@ -10,5 +11,23 @@ class Category(models.Model):
     parent = models.ForeignKey('self', related_name='children', on_delete=models.CASCADE, blank=True, null=True)
     name = models.CharField(max_length=255, unique=True)
 
+    def clean(self):
+        # evitar ciclos: el padre no puede ser la misma categoria ni una hija
+        if self.pk and self.parent_id and CategoryClosure.objects.filter(
+                ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+            raise ValidationError(
+                {'parent': 'Una categoría no puede ser hija de sí misma ni de sus subcategorías'})
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class CategoryClosure(models.Model):
+    # Tabla de clausura: una fila por cada par (ancestro, descendiente),
+    # incluida la propia categoria con depth=0. La mantiene apps.category.signals
+    ancestor = models.ForeignKey(Category, related_name='descendant_links', on_delete=models.CASCADE)
+    descendant = models.ForeignKey(Category, related_name='ancestor_links', on_delete=models.CASCADE)
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, CategoryClosure
+from .tree import (
+    bump_category_tree_version, insert_category_links, move_category_links)
+
+
+@receiver(post_save, sender=Category)
+def update_category_closure(sender, instance, created, **kwargs):
+    if created:
+        insert_category_links(instance)
+        return
+
+    current_parent_id = CategoryClosure.objects.filter(
+        descendant_id=instance.id, depth=1
+    ).values_list('ancestor_id', flat=True).first()
+
+    if current_parent_id != instance.parent_id:
+        move_category_links(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    # Se invalida al confirmar la transaccion, para que otra peticion no
+    # cachee el arbol anterior bajo la version nueva
+    transaction.on_commit(bump_category_tree_version)
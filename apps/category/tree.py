@@ -0,0 +1,111 @@
+from django.core.cache import cache
+
+from core.cache import bump_version, get_version
+
+from .models import Category, CategoryClosure
+
+
+def get_category_family_ids(category_id):
+    # Categoria mas todos sus descendientes (a cualquier profundidad) en una
+    # sola consulta sobre el indice (ancestor, descendant). Lista vacia si la
+    # categoria no existe.
+    return list(
+        CategoryClosure.objects.filter(
+            ancestor_id=category_id
+        ).values_list('descendant_id', flat=True)
+    )
+
+
+def insert_category_links(category):
+    links = [CategoryClosure(
+        ancestor_id=category.id, descendant_id=category.id, depth=0)]
+
+    if category.parent_id:
+        ancestors = CategoryClosure.objects.filter(
+            descendant_id=category.parent_id
+        ).values_list('ancestor_id', 'depth')
+
+        for ancestor_id, depth in ancestors:
+            links.append(CategoryClosure(
+                ancestor_id=ancestor_id,
+                descendant_id=category.id,
+                depth=depth + 1))
+
+    CategoryClosure.objects.bulk_create(links)
+
+
+def move_category_links(category):
+    # Al cambiar de padre se desengancha el subarbol completo de sus
+    # ancestros anteriores y se cuelga de los del nuevo padre
+    subtree = list(
+        CategoryClosure.objects.filter(
+            ancestor_id=category.id
+        ).values_list('descendant_id', 'depth')
+    )
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+    CategoryClosure.objects.filter(
+        descendant_id__in=subtree_ids
+    ).exclude(ancestor_id__in=subtree_ids).delete()
+
+    if category.parent_id:
+        ancestors = list(
+            CategoryClosure.objects.filter(
+                descendant_id=category.parent_id
+            ).values_list('ancestor_id', 'depth')
+        )
+        CategoryClosure.objects.bulk_create([
+            CategoryClosure(
+                ancestor_id=ancestor_id,
+                descendant_id=descendant_id,
+                depth=ancestor_depth + descendant_depth + 1)
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, descendant_depth in subtree
+        ])
+
+
+CATEGORY_TREE_VERSION_KEY = 'category:tree:version'
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+
+
+def build_category_tree():
+    # Una sola consulta; el arbol se arma en memoria con un indice por id
+    categories = Category.objects.order_by('id').values('id', 'name', 'parent_id')
+
+    nodes = {}
+    result = []
+
+    for category in categories:
+        nodes[category['id']] = {
+            'id': category['id'],
+            'name': category['name'],
+            'sub_categories': [],
+        }
+
+    for category in categories:
+        node = nodes[category['id']]
+        parent = nodes.get(category['parent_id'])
+        if parent is None:
+            result.append(node)
+        else:
+            parent['sub_categories'].append(node)
+
+    return result
+
+
+def get_category_tree():
+    # El arbol se guarda por version; al guardar o borrar una categoria la
+    # version sube (ver apps.category.signals) y la entrada vieja expira sola
+    version = get_version(CATEGORY_TREE_VERSION_KEY)
+    key = 'category:tree:%s' % version
+
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(key, tree, CATEGORY_TREE_TIMEOUT)
+
+    return version, tree
+
+
+def bump_category_tree_version():
+    bump_version(CATEGORY_TREE_VERSION_KEY)
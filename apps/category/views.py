@@ -1,9 +1,12 @@
+from django.utils.cache import get_conditional_response
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import permissions
 
-from .models import Category
+from core.cache import make_etag
+
+from .tree import get_category_tree
 
 # Crear las vistas aki.
 
@@ -11,27 +14,18 @@ class ListCategoriesView(APIView):
     permission_classes = (permissions.AllowAny, )
 
     def get(self, request, format=None):
-        if Category.objects.all().exists():
-            categories = Category.objects.all()
-
-            result = []
+        version, categories = get_category_tree()
+        etag = make_etag('categories', version)
 
-            for category in categories:
-                if not category.parent:
-                    item = {}
-                    item['id'] = category.id
-                    item['name'] = category.name
-                    
-                    item['sub_categories'] = []
-                    for cat in categories:
-                        sub_item = {}
-                        if cat.parent and cat.parent.id == category.id:
-                            sub_item['id'] = cat.id
-                            sub_item['name'] = cat.name
-                            sub_item['sub_categories'] = []
+        # El cliente ya tiene esta version del arbol
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
 
-                            item['sub_categories'].append(sub_item)
-                    result.append(item)
-            return Response({'categories': result}, status=status.HTTP_200_OK)
+        if categories:
+            response = Response({'categories': categories}, status=status.HTTP_200_OK)
+            response['ETag'] = etag
+            return response
         else:
             return Response({'error': 'No existen las categirias'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
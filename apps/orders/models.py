@@ -33,6 +33,8 @@ class Order(models.Model):
     shipping_time = models.CharField(max_length=255)
     shipping_price = models.DecimalField(max_digits=5, decimal_places=2)
     date_issued = models.DateTimeField(default=datetime.now)
+    # Para el ETag del listado de ordenes del usuario
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.transaction_id
@@ -1,6 +1,9 @@
+from django.utils.cache import get_conditional_response
+from django.db.models import Count, Max
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from core.cache import make_etag, patch_private_etag
 from .models import Order, OrderItem
 
 # Create your views here.
@@ -10,6 +13,17 @@ class ListOrdersView(APIView):
         user = self.request.user
         try:
             orders = Order.objects.order_by('-date_issued').filter(user=user)
+
+            # Una orden nueva, borrada o modificada (estado desde el admin)
+            # cambia la cantidad o la ultima fecha de modificacion
+            stamp = orders.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+            etag = make_etag(
+                'orders', user.id, stamp['count'],
+                stamp['updated_at'].timestamp() if stamp['updated_at'] else 0)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return patch_private_etag(not_modified, etag)
+
             result = []
 
             for order in orders:
@@ -24,9 +38,12 @@ class ListOrdersView(APIView):
 
                 result.append(item)
             
-            return Response(
-                {'orders': result},
-                status=status.HTTP_200_OK
+            return patch_private_etag(
+                Response(
+                    {'orders': result},
+                    status=status.HTTP_200_OK
+                ),
+                etag
             )
         except:
             return Response(
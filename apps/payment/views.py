@@ -1,12 +1,17 @@
 from django.shortcuts import render
 from django.conf import settings
+from django.db.models import F
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from apps.cart.store import get_cart_store
 from apps.cart.models import Cart, CartItem
 from apps.coupons.models import FixedPriceCoupon, PercentageCoupon
 from apps.orders.models import Order, OrderItem
 from apps.product.models import Product
+from apps.product.cache import invalidate_product
+from apps.product.related import record_sale
+from apps.product.leaderboard import record_leaderboard_sale
 from apps.shipping.models import Shipping
 from django.core.mail import send_mail
 import braintree
@@ -51,6 +56,8 @@ class GetPaymentTotalView(APIView):
         coupon_name = str(coupon_name)
 
         try:
+            # Con el carrito en cache, se guarda antes de leer CartItem
+            get_cart_store().flush(user.id)
             cart = Cart.objects.get(user=user)
 
             #revisar si existen iitems
@@ -174,6 +181,9 @@ class ProcessPaymentView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        # Con el carrito en cache, se guarda antes de leer CartItem (el stock
+        # se vuelve a validar abajo contra la base)
+        get_cart_store().flush(user.id)
         cart = Cart.objects.get(user=user)
 
         #revisar si usuario tiene items en carrito
@@ -269,6 +279,12 @@ class ProcessPaymentView(APIView):
                 Product.objects.filter(id=cart_item.product.id).update(
                     quantity=quantity, sold=sold
                 )
+                # update() no dispara señales: invalidar el cache a mano
+                invalidate_product(cart_item.product.id, content=False)
+                record_sale(
+                    update_product.id, update_product.category_id, sold)
+                record_leaderboard_sale(
+                    update_product.id, update_product.category_id, sold)
             
             #crear orden
             try:
@@ -336,7 +352,9 @@ class ProcessPaymentView(APIView):
                 CartItem.objects.filter(cart=cart).delete()
 
                 # Actualizar carrito
-                Cart.objects.filter(user=user).update(total_items=0)
+                Cart.objects.filter(user=user).update(
+                    total_items=0, version=F('version') + 1)
+                get_cart_store().forget(user.id)
             except:
                 return Response(
                     {'error': 'La transacción fue exitosa y el pedido fue exitoso, pero no se pudo vaciar el carrito.'},
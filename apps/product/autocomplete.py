@@ -0,0 +1,146 @@
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.db import connection
+
+from .cache import get_catalog_content_version
+from .models import Product
+
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+# Los vendidos (orden de las sugerencias) no cambian la version del
+# contenido: el indice se refresca igual pasado este tiempo
+AUTOCOMPLETE_MAX_AGE = 60 * 15
+# Cada worker mira la version en el cache como mucho cada este tiempo, no
+# en cada tecla
+AUTOCOMPLETE_VERSION_CHECK_INTERVAL = 2
+# Espera antes de reconstruir: una rafaga de cambios (un import, ediciones
+# seguidas en el admin) termina en una sola reconstruccion
+AUTOCOMPLETE_REBUILD_DELAY = 5
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    # Minusculas y sin acentos: "Teclado Inalámbrico" -> "teclado inalambrico"
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class PrefixIndex:
+    # Arreglo ordenado de (token, id) para buscar prefijos con bisect, mas
+    # los datos de cada producto para rankear por vendidos
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.products = {}
+        entries = set()
+
+        for product_id, name, sold in rows:
+            self.products[product_id] = (name, sold)
+            for token in tokenize(name):
+                entries.add((token, product_id))
+
+        entries = sorted(entries)
+        self.tokens = [token for token, _ in entries]
+        self.ids = [product_id for _, product_id in entries]
+
+    def matching(self, prefix):
+        start = bisect_left(self.tokens, prefix)
+        # Todo lo que empieza con el prefijo queda antes de prefix + U+10FFFF
+        end = bisect_left(self.tokens, prefix + '\U0010ffff', start)
+        return set(self.ids[start:end])
+
+    def search(self, query, limit):
+        prefixes = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not prefixes:
+            return []
+
+        # Los prefijos mas largos dan menos candidatos: intersectar desde ahi
+        candidates = self.matching(prefixes[0])
+        for prefix in prefixes[1:]:
+            if not candidates:
+                break
+            candidates &= self.matching(prefix)
+
+        top = heapq.nlargest(
+            limit, candidates, key=lambda product_id: (self.products[product_id][1], -product_id))
+        return [
+            {'id': product_id, 'name': self.products[product_id][0]}
+            for product_id in top
+        ]
+
+
+# Un indice por worker. Cuando cambia la version del contenido del catalogo
+# (o envejece) se reconstruye en un hilo aparte y mientras tanto se sigue
+# respondiendo con el anterior; solo el primero se construye en la peticion
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+_checked_at = 0
+
+
+def build_index(version):
+    rows = Product.objects.values_list('id', 'name', 'sold').iterator(chunk_size=5000)
+    return PrefixIndex(version, rows)
+
+
+def rebuild_index():
+    global _index, _rebuilding
+
+    try:
+        time.sleep(AUTOCOMPLETE_REBUILD_DELAY)
+        # La version se lee al final de la espera: incluye toda la rafaga
+        _index = build_index(get_catalog_content_version())
+    except Exception:
+        logger.exception('No se pudo reconstruir el indice de autocompletado')
+    finally:
+        _rebuilding = False
+        # La conexion es propia de este hilo
+        connection.close()
+
+
+def is_stale(index, version):
+    return (index.version != version or
+            time.monotonic() - index.built_at > AUTOCOMPLETE_MAX_AGE)
+
+
+def get_index():
+    global _index, _rebuilding, _checked_at
+
+    index = _index
+
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index(get_catalog_content_version())
+                _checked_at = time.monotonic()
+            return _index
+
+    now = time.monotonic()
+    if _rebuilding or now - _checked_at < AUTOCOMPLETE_VERSION_CHECK_INTERVAL:
+        return index
+    _checked_at = now
+
+    if is_stale(index, get_catalog_content_version()):
+        with _index_lock:
+            if not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=rebuild_index, daemon=True).start()
+    return index
+
+
+def autocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    return get_index().search(query, limit)
@@ -0,0 +1,148 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import bump_version, get_version
+
+from .models import Product
+from .serializers import ProductSerializer
+
+PRODUCT_CACHE_TIMEOUT = 60 * 60
+# Mientras un worker carga el producto desde la base, los demas esperan a
+# que aparezca en el cache en vez de lanzar la misma consulta
+PRODUCT_LOCK_TIMEOUT = 10
+PRODUCT_LOCK_WAIT = 0.05
+PRODUCT_LOCK_RETRIES = 20
+# Cambia con cualquier producto, incluidas las ventas (stock, vendidos); la
+# usan las respuestas que llevan los datos completos de productos
+CATALOG_VERSION_KEY = 'product:catalog:version'
+# Cambia solo con lo que editan el admin o las importaciones (nombre,
+# descripcion, precio, categoria...), no con cada venta; la usan los indices
+# y caches de todo el catalogo (autocompletado, busquedas, totales)
+CATALOG_CONTENT_VERSION_KEY = 'product:catalog:content:version'
+
+
+def product_version_key(product_id):
+    return 'product:%s:version' % product_id
+
+
+def product_payload_key(product_id, version):
+    return 'product:%s:payload:%s' % (product_id, version)
+
+
+def load_product_payload(product_id):
+    product = Product.objects.filter(id=product_id).first()
+    if product is None:
+        return None
+    return dict(ProductSerializer(product).data)
+
+
+def get_product_payload(product_id):
+    version_key = product_version_key(product_id)
+    # La version se crea solo para productos que existen: los ids inventados
+    # no deben dejar claves en el cache
+    if cache.get(version_key) is None and not Product.objects.filter(id=product_id).exists():
+        return None
+    version = get_version(version_key)
+    key = product_payload_key(product_id, version)
+
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    lock_key = key + ':lock'
+    if not cache.add(lock_key, 1, PRODUCT_LOCK_TIMEOUT):
+        for _ in range(PRODUCT_LOCK_RETRIES):
+            time.sleep(PRODUCT_LOCK_WAIT)
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+        # quien tenia el lock no termino a tiempo, cargamos nosotros
+        return load_product_payload(product_id)
+
+    try:
+        # otro worker pudo llenarlo entre el primer get y tomar el lock
+        payload = cache.get(key)
+        if payload is not None:
+            return payload
+        payload = load_product_payload(product_id)
+        if payload is not None:
+            cache.set(key, payload, PRODUCT_CACHE_TIMEOUT)
+        return payload
+    finally:
+        cache.delete(lock_key)
+
+
+def get_product_payloads(product_ids):
+    # Version de lo anterior para muchos productos: dos lecturas multiples al
+    # cache y un solo in_bulk() para los que falten. Devuelve {id: payload}
+    # solo con los productos que existen.
+    version_keys = {
+        product_id: product_version_key(product_id) for product_id in product_ids}
+    versions = cache.get_many(version_keys.values())
+
+    # Sin version en el cache: se crea solo para los que existen
+    unversioned = [
+        product_id for product_id, version_key in version_keys.items()
+        if version_key not in versions]
+    if unversioned:
+        existing = set(
+            Product.objects.filter(id__in=unversioned).values_list('id', flat=True))
+        for product_id in unversioned:
+            if product_id in existing:
+                versions[version_keys[product_id]] = get_version(version_keys[product_id])
+
+    payload_keys = {}
+    for product_id, version_key in version_keys.items():
+        if version_key in versions:
+            payload_keys[product_id] = product_payload_key(
+                product_id, versions[version_key])
+
+    cached = cache.get_many(payload_keys.values())
+    payloads = {}
+    missing = []
+
+    for product_id, key in payload_keys.items():
+        if key in cached:
+            payloads[product_id] = cached[key]
+        else:
+            missing.append(product_id)
+
+    if missing:
+        loaded = {}
+        for product_id, product in Product.objects.in_bulk(missing).items():
+            payloads[product_id] = dict(ProductSerializer(product).data)
+            loaded[payload_keys[product_id]] = payloads[product_id]
+        cache.set_many(loaded, PRODUCT_CACHE_TIMEOUT)
+
+    return payloads
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_content_version():
+    return get_version(CATALOG_CONTENT_VERSION_KEY)
+
+
+def invalidate_catalog():
+    def bump():
+        bump_version(CATALOG_VERSION_KEY)
+        bump_version(CATALOG_CONTENT_VERSION_KEY)
+
+    transaction.on_commit(bump, robust=True)
+
+
+def invalidate_product(product_id, content=True):
+    # Tras el commit, para no cachear datos que aun pueden revertirse.
+    # content=False para cambios que no tocan lo que indexa el catalogo
+    # (stock y vendidos en el checkout, reseñas, miniaturas)
+    def bump():
+        bump_version(product_version_key(product_id))
+        bump_version(CATALOG_VERSION_KEY)
+        if content:
+            bump_version(CATALOG_CONTENT_VERSION_KEY)
+
+    transaction.on_commit(bump, robust=True)
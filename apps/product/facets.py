@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+
+def get_price_buckets():
+    return settings.PRODUCT_PRICE_BUCKETS
+
+
+def price_bucket_filter(low, high):
+    condition = Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def filter_by_price_range(queryset, price_range):
+    # Un rango desconocido no filtra, igual que antes
+    for label, low, high in get_price_buckets():
+        if label == price_range:
+            return queryset.filter(price_bucket_filter(low, high))
+    return queryset
+
+
+def get_facets(queryset, price_range=None):
+    # Una sola consulta agrupada por (categoria, rango de precio). Los
+    # conteos por rango ignoran el rango elegido (para mostrar cuantos hay en
+    # los demas) y los de categoria lo respetan.
+    buckets = get_price_buckets()
+    bucket = Case(
+        *[When(price_bucket_filter(low, high), then=Value(label))
+          for label, low, high in buckets],
+        default=Value(None),
+        output_field=CharField(),
+    )
+    rows = queryset.order_by().annotate(
+        price_bucket=bucket
+    ).values('category_id', 'price_bucket').annotate(count=Count('id'))
+
+    labels = [label for label, _, _ in buckets]
+    selected = price_range if price_range in labels else None
+
+    categories = {}
+    price_counts = dict.fromkeys(labels, 0)
+
+    for row in rows:
+        if row['price_bucket'] is not None:
+            price_counts[row['price_bucket']] += row['count']
+        if selected is None or row['price_bucket'] == selected:
+            categories[row['category_id']] = (
+                categories.get(row['category_id'], 0) + row['count'])
+
+    return {
+        'categories': [
+            {'id': category_id, 'count': count}
+            for category_id, count in sorted(categories.items())
+        ],
+        'price_ranges': [
+            {'label': label, 'min': low, 'max': high, 'count': price_counts[label]}
+            for label, low, high in buckets
+        ],
+    }
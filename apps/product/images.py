@@ -0,0 +1,36 @@
+import os
+
+from PIL import Image, ImageOps
+
+# Este modulo no importa Django: se ejecuta dentro de los procesos del pool
+# de miniaturas (ver apps.product.thumbnails).
+
+
+def variant_name(name, width, extension):
+    base, _ = os.path.splitext(name)
+    return '%s_%s.%s' % (base, width, extension)
+
+
+def generate_variants(media_root, name, sizes):
+    # Crea junto a la foto original una miniatura JPEG y una WebP por cada
+    # ancho en sizes. Devuelve el dict que se guarda en Product.photo_variants
+    variants = {'source': name, 'sizes': {}}
+
+    with Image.open(os.path.join(media_root, name)) as original:
+        image = ImageOps.exif_transpose(original)
+
+        for width in sorted(sizes):
+            resized = image.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+
+            jpeg_name = variant_name(name, width, 'jpg')
+            webp_name = variant_name(name, width, 'webp')
+
+            resized.convert('RGB').save(
+                os.path.join(media_root, jpeg_name), 'JPEG', quality=85, optimize=True)
+            resized.save(
+                os.path.join(media_root, webp_name), 'WEBP', quality=80, method=4)
+
+            variants['sizes'][str(width)] = {'jpeg': jpeg_name, 'webp': webp_name}
+
+    return variants
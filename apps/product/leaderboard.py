@@ -0,0 +1,117 @@
+import time
+from bisect import insort
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import bump_version, get_version
+from apps.category.models import Category, CategoryClosure
+from apps.category.tree import CATEGORY_TREE_VERSION_KEY
+
+from .models import Product
+
+# Los mas vendidos, global y por categoria raiz, guardados en el cache como
+# una lista ordenada de (-sold, id). El checkout la actualiza sin recorrer la
+# tabla; cualquier otro cambio de productos sube la version y la lista se
+# vuelve a leer de la base (con el indice de sold) la proxima vez.
+LEADERBOARD_SIZE = 50
+LEADERBOARD_TIMEOUT = 60 * 60 * 24
+LEADERBOARD_VERSION_KEY = 'product:leaderboard:version'
+LEADERBOARD_LOCK_TIMEOUT = 5
+LEADERBOARD_LOCK_WAIT = 0.01
+LEADERBOARD_LOCK_RETRIES = 20
+
+GLOBAL_SCOPE = 'all'
+
+
+def leaderboard_key(scope):
+    return 'product:leaderboard:%s:%s:%s' % (
+        scope, get_version(LEADERBOARD_VERSION_KEY),
+        get_version(CATEGORY_TREE_VERSION_KEY))
+
+
+def get_root_category_id(category_id):
+    return CategoryClosure.objects.filter(
+        descendant_id=category_id
+    ).order_by('-depth').values_list('ancestor_id', flat=True).first()
+
+
+def is_leaderboard_scope(category_id):
+    # Solo hay lista para las categorias raiz
+    return Category.objects.filter(id=category_id, parent__isnull=True).exists()
+
+
+def load_leaderboard(scope):
+    products = Product.objects.all()
+    if scope != GLOBAL_SCOPE:
+        products = products.filter(
+            category_id__in=CategoryClosure.objects.filter(
+                ancestor_id=scope).values('descendant_id'))
+    return [
+        (-sold, product_id)
+        for product_id, sold in products.order_by(
+            '-sold', 'id').values_list('id', 'sold')[:LEADERBOARD_SIZE]
+    ]
+
+
+def get_leaderboard(scope):
+    key = leaderboard_key(scope)
+    entries = cache.get(key)
+    if entries is None:
+        entries = load_leaderboard(scope)
+        # add y no set: no pisa la lista que un checkout acaba de actualizar
+        cache.add(key, entries, LEADERBOARD_TIMEOUT)
+    return entries
+
+
+def top_sellers(scope, limit):
+    return [product_id for _, product_id in get_leaderboard(scope)[:limit]]
+
+
+def update_leaderboard(scope, product_id, sold):
+    lock_key = leaderboard_key(scope) + ':lock'
+
+    for _ in range(LEADERBOARD_LOCK_RETRIES):
+        if cache.add(lock_key, 1, LEADERBOARD_LOCK_TIMEOUT):
+            break
+        time.sleep(LEADERBOARD_LOCK_WAIT)
+    else:
+        # Sin el lock no se puede actualizar sin perder ventas de otro
+        # checkout: se descarta la lista y se recalcula al leerla
+        invalidate_leaderboard_now()
+        return
+
+    try:
+        key = leaderboard_key(scope)
+        entries = [entry for entry in get_leaderboard(scope) if entry[1] != product_id]
+
+        # Como sold solo crece, un producto fuera de la lista entra solo si
+        # supera al ultimo de ella
+        if len(entries) < LEADERBOARD_SIZE or (-sold, product_id) < entries[-1]:
+            insort(entries, (-sold, product_id))
+            del entries[LEADERBOARD_SIZE:]
+
+        cache.set(key, entries, LEADERBOARD_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+
+
+def record_leaderboard_sale(product_id, category_id, sold):
+    # Tras el commit, para no publicar ventas que se revierten. robust: un
+    # fallo del cache se loguea y no afecta al checkout ya confirmado
+    root_id = get_root_category_id(category_id)
+
+    def update():
+        update_leaderboard(GLOBAL_SCOPE, product_id, sold)
+        if root_id is not None:
+            update_leaderboard(root_id, product_id, sold)
+
+    transaction.on_commit(update, robust=True)
+
+
+def invalidate_leaderboard_now():
+    bump_version(LEADERBOARD_VERSION_KEY)
+
+
+def invalidate_leaderboard():
+    transaction.on_commit(invalidate_leaderboard_now, robust=True)
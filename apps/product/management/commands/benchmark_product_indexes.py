@@ -0,0 +1,114 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.product.models import Product
+
+
+BENCH_TABLE = 'product_index_bench'
+
+# Consultas como las de los listados: filtro por categoria + orden, y orden
+# global con desempate por id como en la paginacion por cursor
+QUERIES = [
+    ('categoria, mas vendidos',
+     'SELECT id FROM {table} WHERE category_id IN (3, 7, 11) ORDER BY sold DESC LIMIT 12'),
+    ('categoria, mas recientes',
+     'SELECT id FROM {table} WHERE category_id IN (3, 7, 11) ORDER BY date_created DESC LIMIT 12'),
+    ('categoria, precio',
+     'SELECT id FROM {table} WHERE category_id = 5 ORDER BY price LIMIT 12'),
+    ('mas vendidos',
+     'SELECT id FROM {table} ORDER BY sold DESC, id DESC LIMIT 12'),
+    ('mas recientes',
+     'SELECT id FROM {table} ORDER BY date_created DESC, id DESC LIMIT 12'),
+    ('precio',
+     'SELECT id FROM {table} ORDER BY price, id LIMIT 12'),
+    ('nombre',
+     'SELECT id FROM {table} ORDER BY name, id LIMIT 12'),
+]
+
+
+def index_columns(index):
+    columns = []
+    for field_name in index.fields:
+        descending = field_name.startswith('-')
+        column = Product._meta.get_field(field_name.lstrip('-')).column
+        columns.append('%s DESC' % column if descending else column)
+    return ', '.join(columns)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los planes de las consultas de listados con y sin los indices '
+        'de Product sobre una tabla temporal con datos de prueba (solo PostgreSQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--categories', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('El benchmark necesita PostgreSQL')
+
+        # Todo en una tabla temporal dentro de una transaccion que se descarta,
+        # asi no se bloquea ni se toca product_product
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                self.seed(cursor, options['rows'], options['categories'])
+                without_indexes = self.explain(cursor)
+                self.create_indexes(cursor)
+                with_indexes = self.explain(cursor)
+            transaction.set_rollback(True)
+
+        for (label, _), before, after in zip(QUERIES, without_indexes, with_indexes):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write('  sin indices (%.2f ms)' % before[0])
+            self.stdout.write('    ' + '\n    '.join(before[1]))
+            self.stdout.write('  con indices (%.2f ms)' % after[0])
+            self.stdout.write('    ' + '\n    '.join(after[1]))
+
+    def seed(self, cursor, rows, categories):
+        started = time.monotonic()
+        cursor.execute(
+            'CREATE TEMP TABLE %s (LIKE %s INCLUDING DEFAULTS) ON COMMIT DROP'
+            % (BENCH_TABLE, Product._meta.db_table))
+        cursor.execute(
+            '''
+            INSERT INTO {table} (
+                id, name, photo, description, price, compare_price, category_id,
+                quantity, sold, date_created, photo_variants, rating_avg,
+                rating_count, rating_histogram
+            )
+            SELECT
+                g, 'Producto ' || md5(g::text), '', '',
+                round((random() * 999)::numeric, 2), round((random() * 999)::numeric, 2),
+                1 + g %% %s, (random() * 100)::int, (random() * 10000)::int,
+                now() - random() * interval '3 years', '{{}}', 0, 0, '[]'
+            FROM generate_series(1, %s) AS g
+            '''.format(table=BENCH_TABLE),
+            [categories, rows])
+        cursor.execute('ALTER TABLE %s ADD PRIMARY KEY (id)' % BENCH_TABLE)
+        # El indice que Django ya crea para la FK
+        cursor.execute('CREATE INDEX ON %s (category_id)' % BENCH_TABLE)
+        cursor.execute('ANALYZE %s' % BENCH_TABLE)
+        self.stdout.write('%s filas en %.1f s' % (rows, time.monotonic() - started))
+
+    def create_indexes(self, cursor):
+        for index in Product._meta.indexes:
+            cursor.execute(
+                'CREATE INDEX ON %s (%s)' % (BENCH_TABLE, index_columns(index)))
+        cursor.execute('ANALYZE %s' % BENCH_TABLE)
+
+    def explain(self, cursor):
+        plans = []
+        for _, query in QUERIES:
+            cursor.execute('EXPLAIN ANALYZE ' + query.format(table=BENCH_TABLE))
+            lines = [row[0] for row in cursor.fetchall()]
+            elapsed = next(
+                float(line.split(':')[1].split()[0])
+                for line in lines if line.startswith('Execution Time'))
+            plans.append((elapsed, [
+                line for line in lines
+                if not line.startswith(('Planning Time', 'Execution Time'))]))
+        return plans
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.product.cache import invalidate_product
+from apps.product.images import generate_variants
+from apps.product.models import Product
+from apps.product.thumbnails import needs_variants
+
+
+class Command(BaseCommand):
+    help = 'Genera en paralelo las miniaturas JPEG/WebP de las fotos de productos que no las tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerar tambien las que ya existen')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        products = Product.objects.exclude(photo='').only(
+            'id', 'photo', 'photo_variants').order_by('id')
+
+        pending = [
+            (product.id, product.photo.name)
+            for product in products.iterator(chunk_size=2000)
+            if options['force'] or needs_variants(product)
+        ]
+        self.stdout.write('%s fotos por procesar' % len(pending))
+
+        done = 0
+        failed = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                futures = [
+                    (product_id, pool.submit(
+                        generate_variants, settings.MEDIA_ROOT, name,
+                        settings.PRODUCT_THUMBNAIL_SIZES))
+                    for product_id, name in batch
+                ]
+
+                updated = []
+                for product_id, future in futures:
+                    try:
+                        updated.append(Product(
+                            id=product_id, photo_variants=future.result()))
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write('Producto %s: %s' % (product_id, error))
+
+                Product.objects.bulk_update(updated, ['photo_variants'])
+                for product in updated:
+                    invalidate_product(product.id, content=False)
+
+                done += len(updated)
+                self.stdout.write('%s/%s' % (done, len(pending)))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Miniaturas generadas: %s, con error: %s' % (done, failed)))
@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from apps.category.models import Category
+from apps.product.cache import invalidate_catalog
+from apps.product.leaderboard import invalidate_leaderboard
+from apps.product.models import Product, empty_rating_histogram
+from apps.product.related import rebuild_top_products
+
+# Columnas que se escriben en product_product. search_vector lo llena el
+# trigger de PostgreSQL, tambien con COPY.
+COPY_COLUMNS = [
+    'name', 'photo', 'description', 'price', 'compare_price', 'category_id',
+    'quantity', 'sold', 'date_created', 'photo_variants', 'rating_avg',
+    'rating_count', 'rating_histogram',
+]
+
+
+class InvalidRow(Exception):
+    pass
+
+
+def read_rows(path, file_format):
+    # Lee el archivo fila por fila, sin cargarlo completo en memoria
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            for row in csv.DictReader(source):
+                yield row
+        else:
+            for line in source:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos desde un archivo CSV o JSONL (name, description, '
+        'price, compare_price, category, quantity, sold, photo) en lotes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--create-categories', action='store_true',
+            help='Crear las categorias que no existan en vez de descartar la fila')
+        parser.add_argument(
+            '--skip-thumbnails', action='store_true',
+            help='No generar las miniaturas de las fotos importadas')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith('.jsonl') else 'csv')
+        batch_size = options['batch_size']
+
+        self.create_categories = options['create_categories']
+        self.categories = {}
+        self.use_copy = connection.vendor == 'postgresql'
+
+        imported = 0
+        skipped = 0
+        batch = []
+
+        try:
+            rows = read_rows(path, file_format)
+            for line, row in enumerate(rows, start=1):
+                batch.append((line, row))
+                if len(batch) >= batch_size:
+                    count, errors = self.write_batch(batch)
+                    imported += count
+                    skipped += errors
+                    batch = []
+                    self.stdout.write('%s productos importados' % imported)
+
+            if batch:
+                count, errors = self.write_batch(batch)
+                imported += count
+                skipped += errors
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        # La carga masiva no dispara señales: recalcular lo derivado
+        rebuild_top_products()
+        invalidate_catalog()
+        invalidate_leaderboard()
+
+        if imported and not options['skip_thumbnails']:
+            call_command('generate_thumbnails', stdout=self.stdout, stderr=self.stderr)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Importados: %s, descartados: %s' % (imported, skipped)))
+
+    def resolve_categories(self, names):
+        # Un solo query por lote para las categorias que aun no conocemos
+        missing = set(name for name in names if name) - set(self.categories)
+        if not missing:
+            return
+
+        for category_id, name in Category.objects.filter(
+                name__in=missing).values_list('id', 'name'):
+            self.categories[name] = category_id
+
+        if self.create_categories:
+            for name in missing - set(self.categories):
+                self.categories[name] = Category.objects.create(name=name).id
+
+    def build_product(self, row):
+        try:
+            category_id = self.categories[row['category'].strip()]
+        except (KeyError, AttributeError):
+            raise InvalidRow('categoria desconocida: %r' % row.get('category'))
+
+        try:
+            product = Product(
+                name=row['name'].strip(),
+                photo=(row.get('photo') or '').strip(),
+                description=row.get('description') or '',
+                price=Decimal(str(row['price'])),
+                compare_price=Decimal(str(row.get('compare_price') or row['price'])),
+                category_id=category_id,
+                quantity=int(row.get('quantity') or 0),
+                sold=int(row.get('sold') or 0),
+                date_created=timezone.now(),
+            )
+            # max_digits, max_length, etc. antes de que falle el lote entero
+            product.clean_fields(exclude=['photo'])
+        except InvalidOperation:
+            raise InvalidRow('precio invalido')
+        except (KeyError, AttributeError, TypeError, ValueError) as error:
+            raise InvalidRow('valor invalido: %s' % error)
+        except ValidationError as error:
+            raise InvalidRow(str(error.message_dict))
+
+        return product
+
+    def write_batch(self, batch):
+        self.resolve_categories(
+            str(row.get('category') or '').strip() for _, row in batch)
+
+        products = []
+        errors = 0
+        for line, row in batch:
+            try:
+                products.append(self.build_product(row))
+            except InvalidRow as error:
+                errors += 1
+                self.stderr.write('Fila %s: %s' % (line, error))
+
+        try:
+            with transaction.atomic():
+                if self.use_copy:
+                    self.copy_products(products)
+                else:
+                    Product.objects.bulk_create(products, batch_size=1000)
+        except DatabaseError as error:
+            # El lote se revierte entero; se informa como las filas
+            # invalidas y se sigue con el siguiente
+            self.stderr.write('Filas %s a %s: %s' % (batch[0][0], batch[-1][0], error))
+            return 0, errors + len(products)
+
+        return len(products), errors
+
+    def copy_products(self, products):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        histogram = json.dumps(empty_rating_histogram())
+
+        for product in products:
+            writer.writerow([
+                product.name, product.photo.name, product.description,
+                product.price, product.compare_price, product.category_id,
+                product.quantity, product.sold, product.date_created.isoformat(),
+                '{}', '0', '0', histogram,
+            ])
+        buffer.seek(0)
+
+        # En CSV un campo vacio sin comillas es NULL para COPY: los textos
+        # vacios (foto o descripcion sin valor) deben llegar como ''
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY %s (%s) FROM STDIN WITH (FORMAT csv, '
+                'FORCE_NOT_NULL (name, photo, description))' % (
+                    Product._meta.db_table, ', '.join(COPY_COLUMNS)),
+                buffer)
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.9 on 2026-10-16 19:51
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# El vector combina nombre (peso A) y descripcion sin etiquetas HTML del
+# CKEditor (peso B). El trigger lo mantiene al dia en cada INSERT/UPDATE,
+# incluso en cargas masivas que no pasan por Product.save().
+CREATE_SEARCH_SQL = """
+CREATE OR REPLACE FUNCTION product_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('spanish', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('spanish', regexp_replace(coalesce(NEW.description, ''), '<[^>]+>', ' ', 'g')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON product_product
+    FOR EACH ROW EXECUTE FUNCTION product_product_search_vector_update();
+
+UPDATE product_product SET name = name;
+
+CREATE INDEX product_product_search_vector_gin
+    ON product_product USING GIN (search_vector);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS product_product_search_vector_gin;
+DROP TRIGGER IF EXISTS product_product_search_vector_trigger ON product_product;
+DROP FUNCTION IF EXISTS product_product_search_vector_update();
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
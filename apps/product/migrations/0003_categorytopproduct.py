@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-16 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TOP_PRODUCTS_PER_CATEGORY = 4
+
+
+def build_top_products(apps, schema_editor):
+    CategoryClosure = apps.get_model('category', 'CategoryClosure')
+    CategoryTopProduct = apps.get_model('product', 'CategoryTopProduct')
+    Product = apps.get_model('product', 'Product')
+
+    category_ids = CategoryClosure.objects.filter(
+        depth=0).values_list('ancestor_id', flat=True)
+
+    for category_id in category_ids:
+        family = CategoryClosure.objects.filter(
+            ancestor_id=category_id).values('descendant_id')
+        top = Product.objects.filter(
+            category_id__in=family
+        ).order_by('-sold', 'id').values_list('id', 'sold')[:TOP_PRODUCTS_PER_CATEGORY]
+
+        CategoryTopProduct.objects.bulk_create([
+            CategoryTopProduct(
+                category_id=category_id, product_id=product_id, sold=sold)
+            for product_id, sold in top
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_categoryclosure'),
+        ('product', '0002_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTopProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sold', models.IntegerField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='top_products', to='category.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+            ],
+            options={
+                'unique_together': {('category', 'product')},
+            },
+        ),
+        migrations.RunPython(build_top_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Indice de trigramas sobre el nombre para la busqueda tolerante a errores
+# (ver apps.product.search). Solo en PostgreSQL.
+CREATE_TRIGRAM_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX product_product_name_trgm
+    ON product_product USING GIN (name gin_trgm_ops);
+"""
+
+DROP_TRIGRAM_SQL = """
+DROP INDEX IF EXISTS product_product_name_trgm;
+"""
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGRAM_SQL)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGRAM_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_product_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from datetime import datetime
 from apps.category.models import Category
 
@@ -8,6 +9,36 @@ from django.conf import settings
 
 domain = settings.DOMAIN
 
+# Histograma de calificaciones: 10 casillas de media estrella (0.5 ... 5.0)
+RATING_BUCKETS = 10
+
+
+def empty_rating_histogram():
+    return [0] * RATING_BUCKETS
+
+
+def current_variants(name, variants):
+    # Las variantes solo sirven si se generaron para la foto actual
+    if variants and variants.get('source') == name:
+        return variants.get('sizes', {})
+    return {}
+
+
+def thumbnail_url(storage, name, variants):
+    sizes = current_variants(name, variants)
+    if sizes:
+        smallest = min(sizes, key=int)
+        return storage.url(sizes[smallest]['jpeg'])
+    return storage.url(name)
+
+
+def srcset(storage, name, variants):
+    sizes = current_variants(name, variants)
+    return ', '.join(
+        '%s %sw' % (storage.url(sizes[width]['webp']), width)
+        for width in sorted(sizes, key=int)
+    )
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     photo = models.ImageField(upload_to='photos/%Y/%m/')
@@ -18,12 +49,52 @@ class Product(models.Model):
     quantity = models.IntegerField(default=0)
     sold = models.IntegerField(default=0)
     date_created = models.DateTimeField(default=datetime.now)
+    # Miniaturas generadas por apps.product.thumbnails
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Agregados de reseñas, los mantiene apps.reviews.ratings
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_histogram = models.JSONField(default=empty_rating_histogram)
+    # Lo mantiene un trigger de PostgreSQL (ver migracion 0002), indexado con GIN
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # Los listados ordenan por fecha, vendidos, precio o nombre, muchas
+        # veces filtrando por category__in. La paginacion por cursor desempata
+        # por id. Ver el comando benchmark_product_indexes.
+        indexes = [
+            models.Index(fields=['category', '-sold'], name='product_cat_sold_idx'),
+            models.Index(fields=['category', '-date_created'], name='product_cat_created_idx'),
+            models.Index(fields=['category', 'price'], name='product_cat_price_idx'),
+            models.Index(fields=['-sold', '-id'], name='product_sold_idx'),
+            models.Index(fields=['-date_created', '-id'], name='product_created_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+        ]
 
     def get_thumbnail(self):
         if self.photo:
-            return self.photo.url
+            return thumbnail_url(
+                self.photo.storage, self.photo.name, self.photo_variants)
+        return ''
+
+    def get_srcset(self):
+        if self.photo:
+            return srcset(self.photo.storage, self.photo.name, self.photo_variants)
         return ''
 
     def __str__(self):
         return self.name
 
+
+class CategoryTopProduct(models.Model):
+    # Los mas vendidos de cada categoria, contando sus subcategorias. Se
+    # guardan RELATED_PRODUCTS_LIMIT + 1 por categoria para que al excluir
+    # el producto que se esta viendo sigan quedando suficientes relacionados.
+    # Lo mantiene apps.product.related.
+    category = models.ForeignKey(Category, related_name='top_products', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    sold = models.IntegerField()
+
+    class Meta:
+        unique_together = ('category', 'product')
@@ -0,0 +1,104 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def get_cursor_param(request):
+    # La paginacion por cursor es opcional: se activa enviando "cursor"
+    # (vacio para la primera pagina) en la query string o en el cuerpo
+    if 'cursor' in request.query_params:
+        return request.query_params.get('cursor') or ''
+    data = request.data
+    if hasattr(data, 'get') and 'cursor' in data:
+        return data.get('cursor') or ''
+    return None
+
+
+def get_page_size(value):
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return settings.REST_FRAMEWORK['PAGE_SIZE']
+    if page_size <= 0:
+        return settings.REST_FRAMEWORK['PAGE_SIZE']
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def encode_cursor(value, last_id):
+    # isoformat completo: DjangoJSONEncoder recorta a milisegundos y el
+    # cursor repetiria filas creadas en el mismo milisegundo
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, last_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, field):
+    # El valor se convierte con el campo de orden: un cursor bien formado
+    # pero de otro orden (una fecha con sortBy=price) es un cursor invalido
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError(cursor)
+        return value, int(last_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError,
+            ValidationError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPaginator:
+    # Pagina por (campo de orden, id): cada pagina es un rango sobre el
+    # indice en vez de un OFFSET, asi la pagina 1000 cuesta lo mismo que la 1
+
+    def __init__(self, sort_field, descending=False, page_size=None):
+        self.sort_field = sort_field
+        self.descending = descending
+        self.page_size = page_size or settings.REST_FRAMEWORK['PAGE_SIZE']
+        self.next_cursor = None
+
+    def get_field(self, queryset):
+        # El orden puede ser una anotacion (rank de la busqueda)
+        annotation = queryset.query.annotations.get(self.sort_field)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(self.sort_field)
+
+    def paginate(self, queryset, cursor):
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(prefix + self.sort_field, prefix + 'id')
+
+        if cursor:
+            value, last_id = decode_cursor(cursor, self.get_field(queryset))
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{self.sort_field + '__' + lookup: value}) |
+                Q(**{self.sort_field: value, 'id__' + lookup: last_id})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+
+        if len(rows) > self.page_size:
+            last = page[-1]
+            if isinstance(last, dict):
+                # filas de .values()
+                value, last_id = last[self.sort_field], last['id']
+            else:
+                value, last_id = getattr(last, self.sort_field), last.id
+            self.next_cursor = encode_cursor(value, last_id)
+        return page
@@ -0,0 +1,106 @@
+from django.db import IntegrityError, transaction
+
+from apps.category.models import CategoryClosure
+
+from .models import CategoryTopProduct, Product
+
+RELATED_PRODUCTS_LIMIT = 3
+TOP_PRODUCTS_PER_CATEGORY = RELATED_PRODUCTS_LIMIT + 1
+
+
+def get_scope_ids(category_id):
+    # Categorias cuya lista de relacionados incluye productos de category_id:
+    # ella misma y todos sus ancestros
+    return list(
+        CategoryClosure.objects.filter(
+            descendant_id=category_id
+        ).values_list('ancestor_id', flat=True)
+    )
+
+
+def refresh_top_products(category_ids):
+    for category_id in category_ids:
+        family = CategoryClosure.objects.filter(
+            ancestor_id=category_id).values('descendant_id')
+        top = Product.objects.filter(
+            category_id__in=family
+        ).order_by('-sold', 'id').values_list('id', 'sold')[:TOP_PRODUCTS_PER_CATEGORY]
+
+        CategoryTopProduct.objects.filter(category_id=category_id).delete()
+        CategoryTopProduct.objects.bulk_create([
+            CategoryTopProduct(
+                category_id=category_id, product_id=product_id, sold=sold)
+            for product_id, sold in top
+        ])
+
+
+def rebuild_top_products():
+    refresh_top_products(
+        CategoryClosure.objects.filter(depth=0).values_list('ancestor_id', flat=True))
+
+
+def refresh_top_products_for(product):
+    # Tras crear/editar/borrar un producto: sus categorias actuales y las
+    # listas donde aparecia (por si cambio de categoria)
+    scope_ids = set(get_scope_ids(product.category_id))
+    scope_ids.update(
+        CategoryTopProduct.objects.filter(
+            product_id=product.id
+        ).values_list('category_id', flat=True)
+    )
+    refresh_top_products(scope_ids)
+
+
+def record_sale(product_id, category_id, sold):
+    # Tras el commit del checkout: el pago ya se cobro y un fallo al
+    # actualizar estas listas no debe revertir la orden (robust solo lo loguea)
+    transaction.on_commit(
+        lambda: apply_sale(product_id, category_id, sold), robust=True)
+
+
+def apply_sale(product_id, category_id, sold):
+    # Actualizacion incremental. Como sold solo crece, el producto entra en
+    # una lista solo si supera al ultimo de ella, y en ese caso desplaza a
+    # ese ultimo
+    for scope_id in get_scope_ids(category_id):
+        try:
+            with transaction.atomic():
+                # Las filas de la lista bloqueadas: dos ventas simultaneas
+                # se aplican una despues de la otra
+                entries = list(
+                    CategoryTopProduct.objects.select_for_update().filter(
+                        category_id=scope_id
+                    ).values_list('id', 'product_id', 'sold')
+                )
+
+                current = [entry for entry in entries if entry[1] == product_id]
+                if current:
+                    CategoryTopProduct.objects.filter(
+                        id=current[0][0], sold__lt=sold).update(sold=sold)
+                    continue
+
+                if len(entries) >= TOP_PRODUCTS_PER_CATEGORY:
+                    last = min(entries, key=lambda entry: (entry[2], -entry[1]))
+                    if sold <= last[2]:
+                        continue
+                    CategoryTopProduct.objects.filter(id=last[0]).delete()
+
+                CategoryTopProduct.objects.create(
+                    category_id=scope_id, product_id=product_id, sold=sold)
+        except IntegrityError:
+            # Con la lista vacia no hay filas que bloquear y otra venta
+            # inserto el mismo producto: se recalcula desde la base
+            with transaction.atomic():
+                refresh_top_products([scope_id])
+
+
+def get_related_products(product_id):
+    # Una lectura indexada sobre la lista precalculada de la categoria
+    category_id = Product.objects.filter(id=product_id).values('category_id')
+    entries = CategoryTopProduct.objects.filter(
+        category_id__in=category_id
+    ).exclude(
+        product_id=product_id
+    ).select_related('product').order_by('-sold', 'product_id')[:RELATED_PRODUCTS_LIMIT]
+
+    return [entry.product for entry in entries]
@@ -0,0 +1,130 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramWordSimilarity)
+from django.db import connections
+from django.db.models import Case, DecimalField, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+# Configuracion de text search usada por el trigger de la migracion 0002
+SEARCH_CONFIG = 'spanish'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# ts_rank y las similitudes de pg_trgm son float4: tras el viaje por el
+# cursor JSON ya no son iguales al valor guardado y la paginacion por cursor
+# salta o repite los empates. Se ordena sobre un numeric redondeado, exacto.
+RANK_FIELD = DecimalField(max_digits=12, decimal_places=6)
+
+
+def relevance(expression):
+    return Cast(expression, RANK_FIELD)
+
+
+def build_search_query(search):
+    # Cada palabra se busca como prefijo ("tecl" encuentra "teclado"), ya que
+    # el buscador del frontend consulta mientras el usuario escribe
+    terms = TERM_RE.findall(search)
+    if not terms:
+        return None
+    raw = ' & '.join(term + ':*' for term in terms)
+    return SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+
+
+def exact_search_products(queryset, search):
+    # En PostgreSQL usamos el indice GIN sobre search_vector y ordenamos por
+    # relevancia; en otros motores (sqlite local) caemos al icontains
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(
+            Q(description__icontains=search) | Q(name__icontains=search)
+        ).order_by('-date_created')
+
+    query = build_search_query(search)
+    if query is None:
+        return queryset.none()
+
+    return queryset.filter(search_vector=query).annotate(
+        rank=relevance(SearchRank(F('search_vector'), query))
+    ).order_by('-rank', '-date_created')
+
+
+def trigrams(text):
+    # Igual que pg_trgm: cada palabra con dos espacios antes y uno despues
+    grams = set()
+    for word in TERM_RE.findall(text.lower()):
+        padded = '  %s ' % word
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(search, text):
+    # Aproximacion de word_similarity() de pg_trgm para sqlite: la mejor
+    # similitud entre la busqueda y algun tramo de palabras seguidas del texto
+    target = trigrams(search)
+    if not target:
+        return 0.0
+
+    words = TERM_RE.findall(text.lower())
+    width = max(1, len(TERM_RE.findall(search)))
+    best = 0.0
+
+    for start in range(len(words)):
+        for end in range(start + 1, min(start + width, len(words)) + 1):
+            grams = trigrams(' '.join(words[start:end]))
+            best = max(best, len(target & grams) / len(target | grams))
+    return best
+
+
+def fuzzy_search_products(queryset, search, threshold):
+    # Nombres parecidos a la busqueda (errores de tipeo en marcas, etc.)
+    # ademas de las coincidencias exactas, ordenados por similitud
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        # El operador %> usa este umbral y puede resolverse con el indice de
+        # trigramas de la migracion 0007. Local a la transaccion (la de la
+        # peticion, ATOMIC_REQUESTS) para no dejarlo en la conexion reusada
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(threshold)])
+
+        matches = Q(name__trigram_word_similar=search)
+        query = build_search_query(search)
+        if query is not None:
+            matches |= Q(search_vector=query)
+
+        return queryset.filter(matches).annotate(
+            rank=relevance(TrigramWordSimilarity(search, 'name'))
+        ).order_by('-rank', '-date_created')
+
+    exact_ids = set(
+        exact_search_products(queryset, search).values_list('id', flat=True))
+    scores = {}
+    for product_id, name in queryset.values_list('id', 'name'):
+        score = word_similarity(search, name)
+        if score >= threshold or product_id in exact_ids:
+            scores[product_id] = score
+
+    return queryset.filter(id__in=scores).annotate(
+        rank=Case(
+            *[When(id=product_id, then=Value(score)) for product_id, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField())
+    ).order_by('-rank', '-date_created')
+
+
+def search_products(queryset, search):
+    # queryset ya con todos los filtros (categoria): el conteo de abajo debe
+    # ser sobre lo que se va a mostrar
+    results = exact_search_products(queryset, search)
+
+    # Si la busqueda exacta trae pocos resultados, probablemente hay un error
+    # de tipeo: se completa con nombres parecidos
+    min_results = settings.PRODUCT_FUZZY_SEARCH_MIN_RESULTS
+    if results.values('id')[:min_results].count() >= min_results:
+        return results
+
+    return fuzzy_search_products(
+        queryset, search, settings.PRODUCT_FUZZY_SEARCH_THRESHOLD)
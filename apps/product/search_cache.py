@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.cache import get_version
+from apps.category.tree import CATEGORY_TREE_VERSION_KEY
+
+from .cache import get_catalog_content_version
+
+
+class LRUCache:
+    # LRU con expiracion, protegido con un lock para workers con hilos.
+    # Los contadores son por proceso.
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'timeout': self.timeout,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0,
+            }
+
+
+search_cache = LRUCache(
+    settings.PRODUCT_SEARCH_CACHE_SIZE, settings.PRODUCT_SEARCH_CACHE_TTL)
+
+# Resultados mas largos no se cachean
+SEARCH_CACHE_MAX_IDS = (
+    settings.REST_FRAMEWORK['PAGE_SIZE'] * settings.PRODUCT_SEARCH_CACHE_MAX_PAGES)
+
+
+def normalize_search(search):
+    return ' '.join(str(search).lower().split())
+
+
+def search_cache_key(view, **params):
+    # Con la version del contenido del catalogo y la del arbol de categorias,
+    # los cambios de productos o de categorias dejan las claves viejas sin
+    # uso. Las ventas (stock, vendidos) no la cambian: ese desfase en el
+    # orden por vendidos dura a lo sumo PRODUCT_SEARCH_CACHE_TTL
+    return (
+        view,
+        get_catalog_content_version(),
+        get_version(CATEGORY_TREE_VERSION_KEY),
+        tuple(sorted(params.items())),
+    )
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Product
+from .models import Product, srcset, thumbnail_url
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,5 +15,80 @@ class ProductSerializer(serializers.ModelSerializer):
             'quantity',
             'sold',
             'date_created',
-            'get_thumbnail'
-        ]
\ No newline at end of file
+            'rating_avg',
+            'rating_count',
+            'rating_histogram',
+            'get_thumbnail',
+            'get_srcset'
+        ]
+
+    def __init__(self, *args, **kwargs):
+        # fields=[...] limita la salida a esos campos (?fields= en las vistas)
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def parse_product_fields(value):
+    # "id,name,price" -> ['id', 'name', 'price']; None = todos los campos
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = [name.strip() for name in value]
+    return [name for name in ProductSerializer.Meta.fields if name in fields] or None
+
+
+# Columnas de la base que necesita cada campo de salida
+PRODUCT_FIELD_COLUMNS = {
+    'category': ['category_id'],
+    'get_thumbnail': ['photo', 'photo_variants'],
+    'get_srcset': ['photo', 'photo_variants'],
+}
+
+
+class ProductRowSerializer:
+    # Misma salida que ProductSerializer pero a partir de filas de .values(),
+    # sin instanciar modelos; pensado para los listados
+
+    def __init__(self, fields=None):
+        self.fields = fields or ProductSerializer.Meta.fields
+        self.representations = ProductSerializer().fields
+        self.storage = Product._meta.get_field('photo').storage
+
+    def columns(self):
+        columns = []
+        for name in self.fields:
+            for column in PRODUCT_FIELD_COLUMNS.get(name, [name]):
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def values(self, queryset, *extra):
+        columns = self.columns()
+        columns += [column for column in extra if column not in columns]
+        return queryset.values(*columns)
+
+    def to_representation(self, row):
+        item = {}
+        for name in self.fields:
+            if name == 'photo':
+                item[name] = self.storage.url(row['photo']) if row['photo'] else None
+            elif name == 'get_thumbnail':
+                item[name] = thumbnail_url(
+                    self.storage, row['photo'], row['photo_variants']) if row['photo'] else ''
+            elif name == 'get_srcset':
+                item[name] = srcset(
+                    self.storage, row['photo'], row['photo_variants']) if row['photo'] else ''
+            elif name == 'category':
+                item[name] = row['category_id']
+            else:
+                value = row[name]
+                item[name] = None if value is None else self.representations[name].to_representation(value)
+        return item
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.category.models import Category
+
+from .cache import invalidate_product
+from .leaderboard import invalidate_leaderboard
+from .models import CategoryTopProduct, Product
+from .related import get_scope_ids, refresh_top_products, refresh_top_products_for
+from .thumbnails import schedule_variants
+
+
+# Cubre Product.save() desde cualquier lugar, incluida la edicion en linea
+# (list_editable) del admin. Los .update() masivos deben invalidar a mano.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_product(instance.id)
+    # sold o la categoria pueden haber cambiado en cualquier sentido
+    invalidate_leaderboard()
+
+
+@receiver(post_save, sender=Product)
+def update_top_products(sender, instance, **kwargs):
+    refresh_top_products_for(instance)
+
+
+@receiver(post_save, sender=Product)
+def generate_photo_variants(sender, instance, **kwargs):
+    schedule_variants(instance)
+
+
+@receiver(pre_delete, sender=Product)
+def remember_top_product_scopes(sender, instance, **kwargs):
+    # Solo hay que recalcular las listas donde aparecia el producto
+    instance._top_product_scopes = list(
+        CategoryTopProduct.objects.filter(
+            product_id=instance.id
+        ).values_list('category_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def refill_top_products(sender, instance, **kwargs):
+    refresh_top_products(getattr(instance, '_top_product_scopes', []))
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_parent(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._old_parent_id = Category.objects.filter(
+            pk=instance.pk).values_list('parent_id', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def refresh_top_products_on_move(sender, instance, created, **kwargs):
+    # Mover una categoria solo cambia las listas de sus ancestros viejos y
+    # nuevos (la clausura ya se actualizo en apps.category.signals; la
+    # cadena del padre viejo no incluye a la categoria movida)
+    old_parent_id = getattr(instance, '_old_parent_id', None)
+    if created or instance.parent_id == old_parent_id:
+        return
+    scope_ids = set()
+    for parent_id in (old_parent_id, instance.parent_id):
+        if parent_id:
+            scope_ids.update(get_scope_ids(parent_id))
+    refresh_top_products(scope_ids)
@@ -0,0 +1,64 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .cache import invalidate_product
+from .images import generate_variants
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    # Pool por proceso web; "spawn" para no heredar conexiones ni hilos
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PRODUCT_THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def needs_variants(product):
+    variants = product.photo_variants or {}
+    return bool(product.photo) and variants.get('source') != product.photo.name
+
+
+def save_variants(product_id, name, variants):
+    # Solo si la foto no cambio mientras se procesaba
+    Product.objects.filter(id=product_id, photo=name).update(
+        photo_variants=variants)
+    invalidate_product(product_id, content=False)
+
+
+def queue_variants(product_id, name):
+    def done(future):
+        try:
+            variants = future.result()
+        except Exception:
+            logger.exception(
+                'No se pudieron generar las variantes del producto %s (%s)',
+                product_id, name)
+            return
+        close_old_connections()
+        try:
+            save_variants(product_id, name, variants)
+        finally:
+            close_old_connections()
+
+    future = get_executor().submit(
+        generate_variants, settings.MEDIA_ROOT, name,
+        settings.PRODUCT_THUMBNAIL_SIZES)
+    future.add_done_callback(done)
+
+
+def schedule_variants(product):
+    # Se encola al confirmar la transaccion, cuando el archivo ya esta guardado
+    if needs_variants(product):
+        product_id, name = product.id, product.photo.name
+        transaction.on_commit(lambda: queue_variants(product_id, name))
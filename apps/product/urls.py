@@ -1,12 +1,15 @@
 from django.urls import path
 
-from .views import ProductDetailView, ListProductsView, ListSearchView, ListRelatedView, ListBySearchView
+from .views import ProductDetailView, ListBatchView, AutocompleteView, ListProductsView, ListSearchView, ListRelatedView, ListBySearchView, SearchCacheStatsView
 
 app_name="product"
 urlpatterns = [
     path('product/<productId>', ProductDetailView.as_view()),
+    path('batch', ListBatchView.as_view()),
     path('get-products', ListProductsView.as_view()),
     path('search', ListSearchView.as_view()),
+    path('autocomplete', AutocompleteView.as_view()),
     path('related/<productId>', ListRelatedView.as_view()),
     path('by/search', ListBySearchView.as_view()),
+    path('search-cache/stats', SearchCacheStatsView.as_view()),
 ]
\ No newline at end of file
@@ -3,14 +3,74 @@ from rest_framework.response import Response
 from rest_framework import permissions, status
 
 from apps.product.models import Product
-from apps.product.serializers import ProductSerializer
-from apps.category.models import Category
-
-from django.db.models import Q
+from apps.product.serializers import (
+    ProductRowSerializer, ProductSerializer, parse_product_fields)
+from apps.product.search import search_products
+from apps.product.search_cache import (
+    SEARCH_CACHE_MAX_IDS, normalize_search, search_cache, search_cache_key)
+from apps.product.autocomplete import (
+    AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, autocomplete)
+from apps.product.cache import get_product_payload, get_product_payloads
+from apps.product.related import get_related_products
+from apps.product.leaderboard import (
+    GLOBAL_SCOPE, LEADERBOARD_SIZE, is_leaderboard_scope, top_sellers)
+from apps.product.facets import filter_by_price_range, get_facets
+from apps.product.pagination import (
+    InvalidCursor, KeysetPaginator, get_cursor_param, get_page_size)
+from apps.category.tree import get_category_family_ids
 
 
 # Create your views here.
 
+def get_product_fields(request):
+    # ?fields=id,name,price (o "fields" en el cuerpo de los POST)
+    fields = request.query_params.get('fields')
+    if fields is None and hasattr(request.data, 'get'):
+        fields = request.data.get('fields')
+    return parse_product_fields(fields)
+
+def serialize_product_list(request, queryset, cache_key=None, **cached):
+    # Los listados se serializan desde .values(), sin instanciar modelos.
+    # Con cache_key se guardan los ids (y lo extra de cached) en el cache de
+    # busquedas para la proxima peticion igual, si no son demasiados.
+    serializer = ProductRowSerializer(get_product_fields(request))
+    rows = list(serializer.values(queryset, 'id'))
+    if cache_key is not None and len(rows) <= SEARCH_CACHE_MAX_IDS:
+        search_cache.set(cache_key, dict(cached, ids=[row['id'] for row in rows]))
+    return serializer.serialize(rows)
+
+def hydrate_product_list(request, product_ids):
+    # Ids ya resueltos -> payloads desde el cache por producto
+    payloads = get_product_payloads(product_ids)
+    fields = get_product_fields(request)
+
+    products = []
+    for product_id in product_ids:
+        product = payloads.get(product_id)
+        # Borrado despues de cachear la busqueda
+        if product is None:
+            continue
+        if fields is not None:
+            product = {name: product[name] for name in fields}
+        products.append(product)
+    return products
+
+def cursor_page_response(request, queryset, key, sort_field, descending, page_size=None):
+    serializer = ProductRowSerializer(get_product_fields(request))
+    paginator = KeysetPaginator(sort_field, descending, page_size)
+    try:
+        page = paginator.paginate(
+            serializer.values(queryset, sort_field, 'id'),
+            get_cursor_param(request))
+    except InvalidCursor:
+        return Response(
+            {'error': 'El cursor de paginación no es válido'},
+            status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {key: serializer.serialize(page), 'next': paginator.next_cursor},
+        status=status.HTTP_200_OK)
+
 class ProductDetailView(APIView):
     permission_classes = (permissions.AllowAny, )
 
@@ -22,24 +82,103 @@ class ProductDetailView(APIView):
                 {'error': 'El ID del producto debe ser un número entero'},
                 status=status.HTTP_404_NOT_FOUND)
         
-        if Product.objects.filter(id=product_id).exists():
-            product = Product.objects.get(id=product_id)
-
-            product = ProductSerializer(product)
-
-            return Response({'product': product.data}, status=status.HTTP_200_OK)
+        # Lectura desde el cache por producto (ver apps.product.cache)
+        product = get_product_payload(product_id)
+
+        if product is not None:
+            fields = get_product_fields(request)
+            if fields is not None:
+                product = {name: product[name] for name in fields}
+            return Response({'product': product}, status=status.HTTP_200_OK)
         else:
             return Response(
                 {'error': 'El producto con este ID no existe'},
                 status=status.HTTP_404_NOT_FOUND)
 
+class ListBatchView(APIView):
+    permission_classes = (permissions.AllowAny, )
+
+    # Maximo de productos por peticion
+    max_ids = 300
+
+    def get(self, request, format=None):
+        # ?ids=1,2,3
+        ids = request.query_params.get('ids', '')
+        return self.batch_response(request, ids.split(',') if ids else [])
+
+    def post(self, request, format=None):
+        # {"ids": [1, 2, 3]}, para listas que no caben comodas en la URL
+        data = request.data
+        ids = data.get('ids', []) if isinstance(data, dict) else None
+        if not isinstance(ids, list) or not all(
+                isinstance(product_id, int) and not isinstance(product_id, bool)
+                for product_id in ids):
+            return Response(
+                {'error': 'Se espera {"ids": [...]} con IDs de producto enteros'},
+                status=status.HTTP_400_BAD_REQUEST)
+        return self.batch_response(request, ids)
+
+    def batch_response(self, request, ids):
+        try:
+            product_ids = list(dict.fromkeys(int(product_id) for product_id in ids))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Los IDs de producto deben ser números enteros'},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        if len(product_ids) > self.max_ids:
+            return Response(
+                {'error': 'Se pueden pedir como máximo %s productos' % self.max_ids},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        # Desde el cache por producto; los que falten, en un solo in_bulk()
+        payloads = get_product_payloads(product_ids)
+        fields = get_product_fields(request)
+
+        products = []
+        missing = []
+
+        # Respetar el orden pedido
+        for product_id in product_ids:
+            product = payloads.get(product_id)
+            if product is None:
+                missing.append(product_id)
+                continue
+            if fields is not None:
+                product = {name: product[name] for name in fields}
+            products.append(product)
+
+        return Response(
+            {'products': products, 'missing': missing},
+            status=status.HTTP_200_OK)
+
+class AutocompleteView(APIView):
+    permission_classes = (permissions.AllowAny, )
+
+    def get(self, request, format=None):
+        query = request.query_params.get('q', '')
+
+        try:
+            limit = int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+
+        # Desde el indice en memoria del worker, sin consultar la base
+        return Response(
+            {'suggestions': autocomplete(query, limit)},
+            status=status.HTTP_200_OK)
+
 class ListProductsView(APIView):
     permission_classes = (permissions.AllowAny, )
 
     def get(self, request, format=None):
         sortBy = request.query_params.get('sortBy')
 
-        if not (sortBy == 'date_created' or sortBy == 'price' or sortBy == 'sold' or sortBy == 'name'):
+        if sortBy == 'rating':
+            # promedio de reseñas guardado en el producto
+            sortBy = 'rating_avg'
+        elif not (sortBy == 'date_created' or sortBy == 'price' or sortBy == 'sold' or sortBy == 'name'):
             sortBy = 'date_created'
         
         order = request.query_params.get('order')
@@ -57,20 +196,53 @@ class ListProductsView(APIView):
         
         if limit <= 0:
             limit = 6
-        
-        if order == 'desc':
-            sortBy = '-' + sortBy
-            products = Product.objects.order_by(sortBy).all()[:int(limit)]
-        elif order == 'asc':
-            products = Product.objects.order_by(sortBy).all()[:int(limit)]
+
+        # Filtro opcional por categoria (con sus subcategorias)
+        category_id = request.query_params.get('category_id')
+        product_results = Product.objects.all()
+
+        if category_id:
+            try:
+                category_id = int(category_id)
+            except ValueError:
+                return Response(
+                    {'error': 'El ID de categoría debe ser un número entero'},
+                    status=status.HTTP_404_NOT_FOUND)
+
+            category_ids = get_category_family_ids(category_id)
+            if not category_ids:
+                return Response(
+                    {'error': 'Categoria no existe'},
+                    status=status.HTTP_404_NOT_FOUND)
+            product_results = product_results.filter(category_id__in=category_ids)
         else:
-            products = Product.objects.order_by(sortBy).all()
+            category_id = None
+
+        # Paginacion por cursor (opcional), acotada al tamaño de pagina
+        if get_cursor_param(request) is not None:
+            return cursor_page_response(
+                request, product_results, 'products', sortBy,
+                order == 'desc', get_page_size(limit))
+
+        # Los mas vendidos (global o de una categoria raiz) salen de la
+        # lista que mantiene el checkout, sin ordenar la tabla
+        if (sortBy == 'sold' and order == 'desc' and limit <= LEADERBOARD_SIZE
+                and (category_id is None or is_leaderboard_scope(category_id))):
+            scope = GLOBAL_SCOPE if category_id is None else category_id
+            products = hydrate_product_list(request, top_sellers(scope, limit))
+        else:
+            if order == 'desc':
+                sortBy = '-' + sortBy
+                products = product_results.order_by(sortBy).all()[:int(limit)]
+            elif order == 'asc':
+                products = product_results.order_by(sortBy).all()[:int(limit)]
+            else:
+                products = product_results.order_by(sortBy).all()
 
-        
-        products = ProductSerializer(products, many=True)
+            products = serialize_product_list(request, products)
 
         if products:
-            return Response({'products': products.data}, status=status.HTTP_200_OK)
+            return Response({'products': products}, status=status.HTTP_200_OK)
         else:
             return Response(
                 {'error': 'No hay productos en la lisat'},
@@ -89,60 +261,57 @@ class ListSearchView(APIView):
                 {'error': 'El ID de categoría debe ser un número entero'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        search = data['search']
+        # Minusculas y espacios simples: busquedas equivalentes comparten cache
+        search = normalize_search(data['search'])
 
-        # Chequear si algun input ocurrio en la busqueda
-        if len(search) == 0:
-            # mostrar todos los productos si no hay input en la busqueda
-            search_results = Product.objects.order_by('-date_created').all()
-        else:
-            # Si hay criterio de busqueda, filtramos con dicho criterio usando Q
-            search_results = Product.objects.filter(
-                Q(description__icontains=search) | Q(name__icontains=search)
-            )
+        # Sin cursor la lista es completa: se cachean los ids del resultado
+        cache_key = None
+        if get_cursor_param(request) is None:
+            cache_key = search_cache_key(
+                'search', search=search, category_id=category_id)
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                return Response(
+                    {'search_products': hydrate_product_list(request, cached['ids'])},
+                    status=status.HTTP_200_OK)
 
         if category_id == 0:
-            search_results = ProductSerializer(search_results, many=True)
-            return Response(
-                {'search_products': search_results.data},
-                status=status.HTTP_200_OK)
-        
-        # revisar si existe categoria
-        if not Category.objects.filter(id=category_id).exists():
-            return Response(
-                {'error': 'Categoria no existe'},
-                status=status.HTTP_404_NOT_FOUND)
+            products = Product.objects.all()
+        else:
+            # categoria y todas sus subcategorias, en una sola consulta
+            category_ids = get_category_family_ids(category_id)
 
-        category = Category.objects.get(id=category_id)
+            # revisar si existe categoria
+            if not category_ids:
+                return Response(
+                    {'error': 'Categoria no existe'},
+                    status=status.HTTP_404_NOT_FOUND)
 
-        # si la categoria tiene apdre, fitlrar solo por la categoria y no el padre tambien
-        if category.parent:
-            search_results = search_results.order_by(
-                '-date_created'
-            ).filter(category=category)
-        
-        else:
-            # si esta categoria padre no tiene hijjos, filtrar solo la categoria
-            if not Category.objects.filter(parent=category).exists():
-                search_results = search_results.order_by(
-                    '-date_created'
-                ).filter(category=category)
-        
-            else:
-                categories = Category.objects.filter(parent=category)
-                filtered_categories = [category]
+            products = Product.objects.filter(category_id__in=category_ids)
 
-                for cat in categories:
-                    filtered_categories.append(cat)
-                
-                filtered_categories = tuple(filtered_categories)
+        # Chequear si algun input ocurrio en la busqueda
+        if len(search) == 0:
+            # mostrar todos los productos si no hay input en la busqueda
+            search_results = products.order_by('-date_created')
+        else:
+            # Si hay criterio de busqueda, usamos el indice de texto completo
+            # ordenado por relevancia. Ya filtrado por categoria, para que la
+            # busqueda aproximada se active si en la categoria hay pocos
+            search_results = search_products(products, search)
+
+        # si hubo busqueda por texto se pagina por relevancia
+        if 'rank' in search_results.query.annotations:
+            cursor_sort = 'rank'
+        else:
+            cursor_sort = 'date_created'
 
-                search_results = search_results.order_by(
-                    '-date_created'
-                ).filter(category__in=filtered_categories)
+        if get_cursor_param(request) is not None:
+            return cursor_page_response(
+                request, search_results, 'search_products', cursor_sort,
+                True, get_page_size(data.get('limit')))
         
-        search_results = ProductSerializer(search_results, many=True)
-        return Response({'search_products': search_results.data}, status=status.HTTP_200_OK)
+        search_results = serialize_product_list(request, search_results, cache_key)
+        return Response({'search_products': search_results}, status=status.HTTP_200_OK)
 
 class ListRelatedView(APIView):
     permission_classes = (permissions.AllowAny, )
@@ -155,59 +324,25 @@ class ListRelatedView(APIView):
                 {'error': 'El ID del producto debe ser un número entero'},
                 status=status.HTTP_404_NOT_FOUND)
         
+        # Lista precalculada de los mas vendidos de su categoria
+        related_products = get_related_products(product_id)
+
+        if related_products:
+            related_products = ProductSerializer(
+                related_products, many=True, fields=get_product_fields(request))
+            return Response(
+                {'related_products': related_products.data},
+                status=status.HTTP_200_OK)
+
         # Existe product id
         if not Product.objects.filter(id=product_id).exists():
             return Response(
                 {'error': 'El producto con este ID de producto no existe'},
                 status=status.HTTP_404_NOT_FOUND)
-            
-        category = Product.objects.get(id=product_id).category
-
-        if Product.objects.filter(category=category).exists():
-            # Si la categoria tiene padrem filtrar solo por la categoria y no el padre tambien
-            if category.parent:
-                related_products = Product.objects.order_by(
-                    '-sold'
-                ).filter(category=category)
-            else:
-                if not Category.objects.filter(parent=category).exists():
-                    related_products = Product.objects.order_by(
-                        '-sold'
-                    ).filter(category=category)
-                
-                else:
-                    categories = Category.objects.filter(parent=category)
-                    filtered_categories = [category]
-
-                    for cat in categories:
-                        filtered_categories.append(cat)
-
-                    filtered_categories = tuple(filtered_categories)
-                    related_products = Product.objects.order_by(
-                        '-sold'
-                    ).filter(category__in=filtered_categories)
-                
-            #Excluir producto que estamos viendo
-            related_products = related_products.exclude(id=product_id)
-            related_products = ProductSerializer(related_products, many=True)
-
-            if len(related_products.data) > 3:
-                return Response(
-                    {'related_products': related_products.data[:3]},
-                    status=status.HTTP_200_OK)
-            elif len(related_products.data) > 0:
-                return Response(
-                    {'related_products': related_products.data},
-                    status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {'error': 'No se encontraron productos relacionados'},
-                    status=status.HTTP_200_OK)
-            
-        else:
-            return Response(
-                {'error': 'No se encontraron productos relacionados'},
-                status=status.HTTP_200_OK)
+
+        return Response(
+            {'error': 'No se encontraron productos relacionados'},
+            status=status.HTTP_200_OK)
 
 class ListBySearchView(APIView):
     permission_classes = (permissions.AllowAny, )
@@ -229,49 +364,49 @@ class ListBySearchView(APIView):
             sort_by = 'date_created'
 
         order = data['order']
+        with_facets = str(data.get('facets', '')).lower() in ('1', 'true')
+
+        cache_key = None
+        if get_cursor_param(request) is None:
+            cache_key = search_cache_key(
+                'by_search', category_id=category_id, price_range=str(price_range),
+                sort_by=sort_by, desc=order == 'desc', facets=with_facets)
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                return Response(
+                    self.result(
+                        hydrate_product_list(request, cached['ids']), cached['facets']),
+                    status=status.HTTP_200_OK)
 
         ## Si categoryID es = 0, filtrar todas las categorias
         if category_id == 0:
             product_results = Product.objects.all()
-        elif not Category.objects.filter(id=category_id).exists():
-            return Response(
-                {'error': 'Esta categoria no existe'},
-                status=status.HTTP_404_NOT_FOUND)
         else:
-            category = Category.objects.get(id=category_id)
-            if category.parent:
-                # Si la categoria tiene padrem filtrar solo por la categoria y no el padre tambien
-                product_results = Product.objects.filter(category=category)
-            else:
-                if not Category.objects.filter(parent=category).exists():
-                    product_results = Product.objects.filter(category=category)
-                else:
-                    categories = Category.objects.filter(parent=category)
-                    filtered_categories = [category]
-
-                    for cat in categories:
-                        filtered_categories.append(cat)
-
-                    filtered_categories = tuple(filtered_categories)
-                    product_results = Product.objects.filter(
-                        category__in=filtered_categories)
-
-        # Filtrar por precio
-        if price_range == '1 - 19':
-            product_results = product_results.filter(price__gte=1)
-            product_results = product_results.filter(price__lt=20)
-        elif price_range == '20 - 39':
-            product_results = product_results.filter(price__gte=20)
-            product_results = product_results.filter(price__lt=40)
-        elif price_range == '40 - 59':
-            product_results = product_results.filter(price__gte=40)
-            product_results = product_results.filter(price__lt=60)
-        elif price_range == '60 - 79':
-            product_results = product_results.filter(price__gte=60)
-            product_results = product_results.filter(price__lt=80)
-        elif price_range == 'Mas de 80':
-            product_results = product_results.filter(price__gte=80)
+            # categoria y todas sus subcategorias, en una sola consulta
+            category_ids = get_category_family_ids(category_id)
+            if not category_ids:
+                return Response(
+                    {'error': 'Esta categoria no existe'},
+                    status=status.HTTP_404_NOT_FOUND)
+            product_results = Product.objects.filter(
+                category_id__in=category_ids)
+
+        # Conteos por categoria y rango de precio (opcional)
+        facets = None
+        if with_facets:
+            facets = get_facets(product_results, price_range)
+
+        # Filtrar por precio segun los rangos configurados
+        product_results = filter_by_price_range(product_results, price_range)
         
+        if get_cursor_param(request) is not None:
+            response = cursor_page_response(
+                request, product_results, 'filtered_products', sort_by,
+                order == 'desc', get_page_size(data.get('limit')))
+            if facets is not None and response.status_code == status.HTTP_200_OK:
+                response.data['facets'] = facets
+            return response
+
         #Filtrar producto por sort_by
         if order == 'desc':
             sort_by = '-' + sort_by
@@ -281,13 +416,27 @@ class ListBySearchView(APIView):
         else:
             product_results = product_results.order_by(sort_by)
         
-        product_results = ProductSerializer(product_results, many=True)
+        product_results = serialize_product_list(
+            request, product_results, cache_key, facets=facets)
 
-        if len(product_results.data) > 0:
-            return Response(
-                {'filtered_products': product_results.data},
-                status=status.HTTP_200_OK)
+        return Response(
+            self.result(product_results, facets), status=status.HTTP_200_OK)
+
+    def result(self, product_results, facets):
+        if len(product_results) > 0:
+            result = {'filtered_products': product_results}
         else:
-            return Response(
-                {'error': 'No se encontraron productos'},
-                status=status.HTTP_200_OK)
\ No newline at end of file
+            result = {'error': 'No se encontraron productos'}
+
+        if facets is not None:
+            result['facets'] = facets
+
+        return result
+
+class SearchCacheStatsView(APIView):
+    # Contadores del cache de busquedas de este worker, para ajustar
+    # PRODUCT_SEARCH_CACHE_SIZE / PRODUCT_SEARCH_CACHE_TTL
+    permission_classes = (permissions.IsAdminUser, )
+
+    def get(self, request, format=None):
+        return Response({'search_cache': search_cache.stats()}, status=status.HTTP_200_OK)
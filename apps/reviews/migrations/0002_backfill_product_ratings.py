@@ -0,0 +1,42 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations
+from django.db.models import Count
+
+RATING_BUCKETS = 10
+
+
+def backfill_product_ratings(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    aggregates = {}
+    rows = Review.objects.order_by().values(
+        'product_id', 'rating').annotate(count=Count('id'))
+
+    for row in rows:
+        histogram, total, count = aggregates.get(
+            row['product_id'], ([0] * RATING_BUCKETS, Decimal('0'), 0))
+        index = int((row['rating'] * 2).quantize(Decimal('1'), ROUND_HALF_UP)) - 1
+        histogram[min(max(index, 0), RATING_BUCKETS - 1)] += row['count']
+        aggregates[row['product_id']] = (
+            histogram, total + row['rating'] * row['count'], count + row['count'])
+
+    for product_id, (histogram, total, count) in aggregates.items():
+        Product.objects.filter(id=product_id).update(
+            rating_avg=(total / count).quantize(Decimal('0.01'), ROUND_HALF_UP),
+            rating_count=count,
+            rating_histogram=histogram
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_product_rating_aggregates'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_ratings, migrations.RunPython.noop),
+    ]
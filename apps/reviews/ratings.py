@@ -0,0 +1,46 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Count
+
+from apps.product.cache import invalidate_product
+from apps.product.models import Product, RATING_BUCKETS, empty_rating_histogram
+from .models import Review
+
+
+def rating_bucket(rating):
+    # 0.5 -> 0, 1.0 -> 1, ... 5.0 -> 9; valores intermedios a la media
+    # estrella mas cercana
+    index = int((Decimal(rating) * 2).quantize(Decimal('1'), ROUND_HALF_UP)) - 1
+    return min(max(index, 0), RATING_BUCKETS - 1)
+
+
+def update_product_rating(product_id):
+    # Se llama dentro de la transaccion de la vista que crea, edita o borra
+    # la reseña. El bloqueo de la fila del producto serializa las escrituras
+    # concurrentes sobre el mismo producto.
+    Product.objects.select_for_update().filter(id=product_id).values_list('id').first()
+
+    ratings = Review.objects.filter(
+        product_id=product_id
+    ).order_by().values('rating').annotate(count=Count('id'))
+
+    histogram = empty_rating_histogram()
+    total = Decimal('0')
+    count = 0
+
+    for row in ratings:
+        histogram[rating_bucket(row['rating'])] += row['count']
+        total += row['rating'] * row['count']
+        count += row['count']
+
+    if count:
+        average = (total / count).quantize(Decimal('0.01'), ROUND_HALF_UP)
+    else:
+        average = Decimal('0')
+
+    Product.objects.filter(id=product_id).update(
+        rating_avg=average,
+        rating_count=count,
+        rating_histogram=histogram
+    )
+    invalidate_product(product_id, content=False)
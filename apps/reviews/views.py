@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import permissions, status
 from apps.product.models import Product
 from .models import Review
+from .ratings import update_product_rating
 
 # Create your views here.
 
@@ -143,6 +144,9 @@ class CreateProductReviewView(APIView):
                 comment=comment
             )
 
+            # Actualizar promedio e histograma del producto
+            update_product_rating(product.id)
+
             if Review.objects.filter(user=user, product=product).exists():
                 result['id'] = review.id
                 result['rating'] = review.rating
@@ -227,6 +231,9 @@ class UpdateProductReviewView(APIView):
                     comment=comment
                 )
 
+                # Actualizar promedio e histograma del producto
+                update_product_rating(product.id)
+
                 review = Review.objects.get(user=user, product=product)
 
                 result['id'] = review.id
@@ -286,6 +293,9 @@ class DeleteProductReviewView(APIView):
             if Review.objects.filter(user=user, product=product).exists():
                 Review.objects.filter(user=user, product=product).delete()
 
+                # Actualizar promedio e histograma del producto
+                update_product_rating(product.id)
+
                 reviews = Review.objects.order_by('-date_created').filter(
                     product=product
                 )
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-16 20:07
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_items(apps, schema_editor):
+    # Antes de la restriccion: un solo item por (lista, producto), y
+    # total_items recalculado desde los items
+    WishList = apps.get_model('wishlist', 'WishList')
+    WishListItem = apps.get_model('wishlist', 'WishListItem')
+
+    duplicates = WishListItem.objects.values('wishlist_id', 'product_id').annotate(
+        rows=Count('id'), first_id=Min('id')
+    ).filter(rows__gt=1)
+
+    for duplicate in duplicates:
+        WishListItem.objects.filter(
+            wishlist_id=duplicate['wishlist_id'], product_id=duplicate['product_id']
+        ).exclude(id=duplicate['first_id']).delete()
+
+    for wishlist in WishList.objects.annotate(items=Count('wishlistitem')):
+        if wishlist.total_items != wishlist.items:
+            WishList.objects.filter(id=wishlist.id).update(total_items=wishlist.items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-16 20:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist', '0002_remove_duplicate_items'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='wishlistitem',
+            unique_together={('wishlist', 'product')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-16 20:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist', '0003_unique_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -11,8 +11,14 @@ User = settings.AUTH_USER_MODEL
 class WishList(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     total_items = models.IntegerField(default=0)
+    # Sube con cada cambio (respuestas delta, ver apps.cart)
+    version = models.PositiveIntegerField(default=0)
 
 
 class WishListItem(models.Model):
     wishlist = models.ForeignKey(WishList, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
\ No newline at end of file
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+
+    class Meta:
+        # Un producto aparece una sola vez por lista de deseos
+        unique_together = ('wishlist', 'product')
@@ -1,20 +1,41 @@
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from apps.cart.models import Cart, CartItem
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from apps.cart.snapshot import wants_delta
+from apps.cart.store import ItemMissing, get_cart_store
+from core.cache import make_etag, patch_private_etag
 from .models import WishList, WishListItem
+from apps.product.cache import get_catalog_version
 from apps.product.models import Product
 from apps.product.serializers import ProductSerializer
 
 # Create your views here.
 
+def wishlist_status(wishlist_id):
+    version, total_items = WishList.objects.filter(
+        id=wishlist_id).values_list('version', 'total_items').get()
+    return {'version': version, 'total_items': total_items}
+
+
 class GetItemsView(APIView):
     def get(self, request, format=None):
         user = self.request.user
 
         try:
             wishlist = WishList.objects.get(user=user)
+
+            # Como en el carrito: la version de la lista mas la del catalogo,
+            # ya que los items llevan los datos de cada producto
+            etag = make_etag(
+                'wishlist', user.id, wishlist.version, get_catalog_version())
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return patch_private_etag(not_modified, etag)
+
             wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
             result = []
 
@@ -26,9 +47,12 @@ class GetItemsView(APIView):
                     product = ProductSerializer(product)
                     item['product'] = product.data
                     result.append(item)
-            return Response(
-                {'wishlist': result},
-                status=status.HTTP_200_OK
+            return patch_private_etag(
+                Response(
+                    {'wishlist': result, 'version': wishlist.version},
+                    status=status.HTTP_200_OK
+                ),
+                etag
             )
         except:
             return Response(
@@ -50,46 +74,52 @@ class AddItemView(APIView):
             )
         
         try:
-            if not Product.objects.filter(id=product_id).exists():
+            product = Product.objects.filter(id=product_id).first()
+            if product is None:
                 return Response(
                     {'error': 'This product does not exist'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=product_id)
             wishlist = WishList.objects.get(user=user)
 
-            if WishListItem.objects.filter(wishlist=wishlist, product=product).exists():
+            # La restriccion unica (wishlist, product) resuelve las peticiones
+            # simultaneas: solo una crea el item y suma al contador
+            try:
+                with transaction.atomic():
+                    wishlist_item = WishListItem.objects.create(
+                        product=product,
+                        wishlist=wishlist
+                    )
+            except IntegrityError:
                 return Response(
                     {'error': 'Item already in wishlist'},
                     status=status.HTTP_409_CONFLICT
                 )
 
-            WishListItem.objects.create(
-                product=product,
-                wishlist=wishlist
+            WishList.objects.filter(id=wishlist.id).update(
+                total_items=F('total_items') + 1,
+                version=F('version') + 1
             )
 
-            if WishListItem.objects.filter(product=product, wishlist=wishlist).exists():
-                total_items = int(wishlist.total_items) + 1
-                WishList.objects.filter(user=user).update(
-                    total_items=total_items
-                )
+            # Si estaba en el carrito, pasa a la lista de deseos
+            try:
+                get_cart_store().remove(user.id, product.id)
+            except ItemMissing:
+                pass
 
-                cart = Cart.objects.get(user=user)
-            
-                if CartItem.objects.filter(cart=cart, product=product).exists():
-                    CartItem.objects.filter(
-                        cart=cart,
-                        product=product
-                    ).delete()
-
-                    if not CartItem.objects.filter(cart=cart, product=product).exists():
-                        # actualizar items totales ene l carrito
-                        total_items = int(cart.total_items) - 1
-                        Cart.objects.filter(user=user).update(
-                            total_items=total_items
-                        )
+            # Respuesta delta: solo el item agregado
+            if wants_delta(request):
+                return Response(
+                    dict(
+                        wishlist_status(wishlist.id),
+                        item={
+                            'id': wishlist_item.id,
+                            'product': ProductSerializer(product).data
+                        }
+                    ),
+                    status=status.HTTP_201_CREATED
+                )
 
             wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
             result = []
@@ -149,27 +179,32 @@ class RemoveItemView(APIView):
 
         try:
             wishlist = WishList.objects.get(user=user)
-            if not Product.objects.filter(id=product_id).exists():
-                return Response(
-                    {'error': 'Product with this ID does not exist'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            product = Product.objects.get(id=product_id)
-            if not WishListItem.objects.filter(wishlist=wishlist, product=product).exists():
+            deleted, _ = WishListItem.objects.filter(
+                wishlist=wishlist,
+                product_id=product_id
+            ).delete()
+
+            if not deleted:
+                if not Product.objects.filter(id=product_id).exists():
+                    return Response(
+                        {'error': 'Product with this ID does not exist'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
                 return Response(
                     {'error': 'This product is not in your wishlist'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            WishListItem.objects.filter(
-                wishlist=wishlist,
-                product=product
-            ).delete()
 
-            if not WishListItem.objects.filter(wishlist=wishlist, product=product).exists():
-                # Actualiizar el total de items en el wishlist
-                total_items = int(wishlist.total_items) - 1
-                WishList.objects.filter(user=user).update(
-                    total_items=total_items
+            # Actualiizar el total de items en el wishlist
+            WishList.objects.filter(id=wishlist.id).update(
+                total_items=F('total_items') - 1,
+                version=F('version') + 1
+            )
+
+            if wants_delta(request):
+                return Response(
+                    dict(wishlist_status(wishlist.id), removed=product_id),
+                    status=status.HTTP_200_OK
                 )
             
             wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+# Las versiones expiran para no acumular claves de objetos que ya nadie pide;
+# al volver arrancan del reloj, asi que expirar nunca sirve datos viejos
+VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def get_version(key):
+    # Contador de version guardado en el cache. Si la clave no existe (o fue
+    # expulsada) arranca en un valor unico basado en el reloj, para no volver
+    # a una version anterior y servir datos viejos cacheados con ella
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, VERSION_TIMEOUT)
+        return version
+    # incr no renueva la expiracion en todos los backends (db la reinicia al
+    # timeout por defecto)
+    cache.touch(key, VERSION_TIMEOUT)
+    return version
+
+
+def make_etag(*parts):
+    return '"%s"' % '-'.join(str(part) for part in parts)
+
+
+def patch_private_etag(response, etag):
+    # Respuestas por usuario: solo el navegador puede guardarlas, separadas
+    # por token, y debe revalidarlas con If-None-Match antes de usarlas
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
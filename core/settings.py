@@ -3,6 +3,7 @@ import os
 import environ
 from datetime import timedelta
 from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 
 env = environ.Env()
 environ.Env.read_env()
@@ -41,6 +42,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 PROJECT_APP = [
@@ -124,6 +126,17 @@ DATABASES = {
 
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
 
+# Cache compartido entre workers: Redis (CACHE_URL=redis://host:6379/1).
+# Las invalidaciones (versiones de productos, catalogo, categorias), los
+# locks con cache.add y los contadores con incr tienen que ser atomicos y
+# verse desde todos los procesos, incluidos los comandos de manage.py.
+# El cache en base (dbcache) no sirve: sus escrituras quedan dentro de la
+# transaccion de la peticion (ATOMIC_REQUESTS) y su incr no es atomico.
+# locmemcache:// solo para pruebas con un unico proceso.
+CACHES = {
+    "default": env.cache("CACHE_URL", default="redis://127.0.0.1:6379/1"),
+}
+
 CORS_ALLOWED_ORIGINS  = [
     'http://localhost:8000',
     'http://localhost:3000',
@@ -139,6 +152,12 @@ CORS_ALLOWED_ORIGINS  = [
 
 CORS_ALLOW_HEADERS = list(default_headers) + [
     "authorization",
+    "if-none-match",
+]
+
+# Para que el frontend pueda leer el ETag y mandarlo en If-None-Match
+CORS_EXPOSE_HEADERS = [
+    "etag",
 ]
 
 
@@ -225,6 +244,25 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'build/static')
 ]
 
+# Miniaturas de productos (JPEG + WebP por ancho), generadas fuera de la
+# peticion en un pool de procesos
+PRODUCT_THUMBNAIL_SIZES = [300, 600]
+PRODUCT_THUMBNAIL_WORKERS = 2
+
+# Cache en memoria (por worker) de los ids que devuelven las busquedas:
+# cantidad de busquedas distintas y segundos que se guardan. Solo se
+# cachean resultados de hasta estas paginas (de PAGE_SIZE): las busquedas
+# vacias o sin filtro devuelven todo el catalogo y llenarian la memoria
+PRODUCT_SEARCH_CACHE_SIZE = 512
+PRODUCT_SEARCH_CACHE_TTL = 60
+PRODUCT_SEARCH_CACHE_MAX_PAGES = 5
+
+# Busqueda tolerante a errores de tipeo (similitud de trigramas): se usa
+# cuando la busqueda exacta devuelve menos de MIN_RESULTS productos, y solo
+# entran nombres con similitud >= THRESHOLD (0 a 1)
+PRODUCT_FUZZY_SEARCH_MIN_RESULTS = 3
+PRODUCT_FUZZY_SEARCH_THRESHOLD = 0.4
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly'
@@ -236,6 +274,30 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 12
 }
 
+# Donde vive el carrito mientras se navega: 'database' (Cart/CartItem) o
+# 'cache', que lo guarda en CartItem al pagar o con el comando flush_carts.
+# 'cache' necesita Redis (CACHE_URL) con maxmemory-policy volatile-*: los
+# carritos con cambios sin guardar no tienen expiracion y no deben ser
+# expulsados. Los caches locmem y db no sirven (por proceso / se purgan).
+CART_STORE = env('CART_STORE', default='database')
+
+if CART_STORE == 'cache' and 'redis' not in CACHES['default']['BACKEND'].lower():
+    raise ImproperlyConfigured('CART_STORE = cache necesita un CACHE_URL de Redis')
+
+# Items de carrito sin cambios por mas de estos dias se borran con el
+# comando prune_carts (pensado para correr a diario desde cron)
+CART_ITEM_MAX_AGE_DAYS = env.int('CART_ITEM_MAX_AGE_DAYS', default=90)
+
+# Rangos de precio del catalogo: (etiqueta, minimo, maximo exclusivo o None).
+# La etiqueta es el valor que envia el frontend en price_range.
+PRODUCT_PRICE_BUCKETS = [
+    ('1 - 19', 1, 20),
+    ('20 - 39', 20, 40),
+    ('40 - 59', 40, 60),
+    ('60 - 79', 60, 80),
+    ('Mas de 80', 80, None),
+]
+
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.google.GoogleOAuth2',
     'social_core.backends.facebook.FacebookOAuth2',